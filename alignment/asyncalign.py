@@ -0,0 +1,217 @@
+import asyncio
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Requests whose dynamic programming matrices have at most BATCH_CELLS cells
+# are collected for up to BATCH_DELAY seconds and sent to the executor
+# together, at most BATCH_SIZE at a time.
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_BATCH_CELLS = 64 * 64
+DEFAULT_BATCH_DELAY = 0.001
+
+
+# Workers ---------------------------------------------------------------------
+
+def alignPairs(aligner, pairs):
+    # Runs in the executor, possibly in another process.
+    return [aligner.align(first, second, backtrace)
+            for first, second, backtrace in pairs]
+
+
+# Front end -------------------------------------------------------------------
+
+class _Request(object):
+
+    __slots__ = ('first', 'second', 'backtrace', 'future')
+
+    def __init__(self, first, second, backtrace, future):
+        self.first = first
+        self.second = second
+        self.backtrace = backtrace
+        self.future = future
+
+
+class _LoopState(object):
+    # Batching state of one event loop.
+
+    def __init__(self, maxInFlight):
+        self.semaphore = asyncio.Semaphore(maxInFlight)
+        self.pending = list()
+        self.timer = None
+        self.tasks = set()
+
+
+class AsyncAligner(object):
+    # Runs the alignments of an aligner in an executor so that they do not
+    # block the event loop. A thread pool is used unless `executor` is given;
+    # process pools need picklable aligners and sequences but use all cores.
+    #
+    # At most maxInFlight batches run or wait in the executor at any time.
+    # Other requests wait in the event loop, where cancelling them, directly
+    # or by a timeout, drops them before they reach the executor. A batch
+    # that has not started yet is withdrawn once all of its requests are
+    # cancelled. Alignments that have started always run to the end.
+
+    def __init__(self, aligner, executor=None, workers=None, maxInFlight=None,
+                 batchSize=DEFAULT_BATCH_SIZE, batchCells=DEFAULT_BATCH_CELLS,
+                 batchDelay=DEFAULT_BATCH_DELAY):
+        self.aligner = aligner
+        self.ownsExecutor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(workers)
+        self.executor = executor
+        if maxInFlight is None:
+            # Keep the workers busy while results travel back.
+            maxInFlight = 2 * (workers or os.cpu_count() or 1)
+        self.maxInFlight = maxInFlight
+        self.batchSize = batchSize
+        self.batchCells = batchCells
+        self.batchDelay = batchDelay
+        self.__states = weakref.WeakKeyDictionary()
+
+    async def alignAsync(self, first, second, backtrace=False, timeout=None):
+        # Same result as aligner.align. Raises asyncio.TimeoutError when the
+        # result is not ready within `timeout` seconds.
+        future = self.submit(first, second, backtrace)
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    async def alignManyAsync(self, query, targets, backtrace=False,
+                             timeout=None):
+        # Yields (index, result) pairs of the targets as they complete.
+        # Targets are taken from the iterable only as results are consumed,
+        # so a slow consumer holds back the producer. Work that is still
+        # queued is cancelled when the iteration stops early, and
+        # asyncio.TimeoutError is raised when not all results are ready
+        # within `timeout` seconds.
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        targets = enumerate(targets)
+        limit = self.maxInFlight * self.batchSize
+        running = dict()
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(running) < limit:
+                    item = next(targets, None)
+                    if item is None:
+                        exhausted = True
+                    else:
+                        k, target = item
+                        running[self.submit(query, target, backtrace)] = k
+                if not running:
+                    return
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait(
+                    running, timeout=remaining,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for future in sorted(done, key=running.get):
+                    k = running.pop(future)
+                    yield k, future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+    def submit(self, first, second, backtrace=False):
+        # Queues one alignment and returns an asyncio future of its result.
+        loop = asyncio.get_running_loop()
+        state = self.__state(loop)
+        request = _Request(first, second, backtrace, loop.create_future())
+        if len(first) * len(second) > self.batchCells:
+            self.__start(loop, state, [request])
+            return request.future
+        state.pending.append(request)
+        if len(state.pending) >= self.batchSize:
+            self.__flush(loop, state)
+        elif state.timer is None:
+            state.timer = loop.call_later(self.batchDelay, self.__flush,
+                                          loop, state)
+        return request.future
+
+    def close(self):
+        # Shuts down the executor if it was created by this front end.
+        if self.ownsExecutor:
+            self.executor.shutdown(wait=False)
+
+    def __state(self, loop):
+        state = self.__states.get(loop)
+        if state is None:
+            state = _LoopState(self.maxInFlight)
+            self.__states[loop] = state
+        return state
+
+    def __flush(self, loop, state):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        pending = state.pending
+        state.pending = list()
+        for start in range(0, len(pending), self.batchSize):
+            self.__start(loop, state, pending[start:start + self.batchSize])
+
+    def __start(self, loop, state, batch):
+        batch = [r for r in batch if not r.future.done()]
+        if batch:
+            task = loop.create_task(self.__run(state, batch))
+            # Keep a reference until the task is done.
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+
+    async def __run(self, state, batch):
+        async with state.semaphore:
+            # Drop the requests cancelled while waiting for a slot.
+            batch = [r for r in batch if not r.future.done()]
+            if not batch:
+                return
+            job = self.executor.submit(
+                alignPairs, self.aligner,
+                [(r.first, r.second, r.backtrace) for r in batch])
+
+            def withdraw(_):
+                if all(r.future.cancelled() for r in batch):
+                    job.cancel()
+
+            for request in batch:
+                request.future.add_done_callback(withdraw)
+            try:
+                results = await asyncio.wrap_future(job)
+            except asyncio.CancelledError:
+                for request in batch:
+                    request.future.cancel()
+                return
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                return
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.aligner)
+
+
+# Shared front ends of aligners, used by SequenceAligner.alignAsync. They
+# refer to their aligners weakly and share one thread pool.
+_frontEnds = weakref.WeakKeyDictionary()
+_shared = dict()
+
+
+def frontEnd(aligner):
+    front = _frontEnds.get(aligner)
+    if front is None:
+        if 'executor' not in _shared:
+            _shared['executor'] = ThreadPoolExecutor()
+        front = AsyncAligner(weakref.proxy(aligner), _shared['executor'])
+        _frontEnds[aligner] = front
+    return front
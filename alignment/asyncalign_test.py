@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from .sequencealigner import SimpleScoring
+from .sequencealigner import LocalSequenceAligner
+from .asyncalign import AsyncAligner
+from .testing import ALIGNER
+from .testing import SEQUENCES
+
+
+QUERY = SEQUENCES[0]
+TARGETS = SEQUENCES
+
+
+class CountingExecutor(ThreadPoolExecutor):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingExecutor, self).__init__(*args, **kwargs)
+        self.jobs = 0
+
+    def submit(self, *args, **kwargs):
+        self.jobs += 1
+        return super(CountingExecutor, self).submit(*args, **kwargs)
+
+
+class BlockingAligner(LocalSequenceAligner):
+    # Waits for `release` before aligning and counts the alignments.
+
+    def __init__(self):
+        super(BlockingAligner, self).__init__(SimpleScoring(3, -1), -2)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def align(self, first, second, backtrace=False, compact=False):
+        self.release.wait(5)
+        self.calls += 1
+        return super(BlockingAligner, self).align(first, second, backtrace,
+                                                  compact)
+
+
+def test_align_async():
+    async def run():
+        return await asyncio.gather(*[ALIGNER.alignAsync(QUERY, t)
+                                      for t in TARGETS])
+    assert asyncio.run(run()) == [ALIGNER.align(QUERY, t) for t in TARGETS]
+
+    score, alignments = asyncio.run(
+        ALIGNER.alignAsync(QUERY, TARGETS[3], backtrace=True))
+    expectedScore, expectedAlignments = ALIGNER.align(QUERY, TARGETS[3], True)
+    assert score == expectedScore
+    assert [a.key() for a in alignments] == \
+        [a.key() for a in expectedAlignments]
+
+
+def test_small_requests_are_batched():
+    executor = CountingExecutor(1)
+    front = AsyncAligner(ALIGNER, executor, batchSize=4, batchDelay=0.05)
+
+    async def run():
+        return await asyncio.gather(*[front.alignAsync(QUERY, t)
+                                      for t in TARGETS])
+    assert asyncio.run(run()) == [ALIGNER.align(QUERY, t) for t in TARGETS]
+    assert executor.jobs == 2
+    executor.shutdown()
+
+
+def test_align_many_async():
+    async def run():
+        return [item async for item in ALIGNER.alignManyAsync(
+            QUERY, iter(TARGETS))]
+    results = asyncio.run(run())
+    assert sorted(results) == \
+        [(k, ALIGNER.align(QUERY, t)) for k, t in enumerate(TARGETS)]
+
+    # One request at a time.
+    front = AsyncAligner(ALIGNER, workers=1, maxInFlight=1, batchSize=1)
+
+    async def limited():
+        return [item async for item in front.alignManyAsync(QUERY, TARGETS)]
+    assert sorted(asyncio.run(limited())) == sorted(results)
+    front.close()
+
+
+def test_cancelled_requests_do_not_run():
+    aligner = BlockingAligner()
+    front = AsyncAligner(aligner, workers=1, maxInFlight=1, batchSize=1)
+
+    async def run():
+        first = asyncio.ensure_future(front.alignAsync(QUERY, TARGETS[0]))
+        queued = [asyncio.ensure_future(front.alignAsync(QUERY, t))
+                  for t in TARGETS[1:]]
+        await asyncio.sleep(0.05)
+        for task in queued:
+            task.cancel()
+        aligner.release.set()
+        await asyncio.gather(*queued, return_exceptions=True)
+        return await first
+    assert asyncio.run(run()) == ALIGNER.align(QUERY, TARGETS[0])
+    assert aligner.calls == 1
+    front.close()
+
+
+def test_deadlines():
+    aligner = BlockingAligner()
+    front = AsyncAligner(aligner, workers=1, maxInFlight=1, batchSize=1)
+
+    async def single():
+        await front.alignAsync(QUERY, TARGETS[0], timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(single())
+
+    async def many():
+        results = list()
+        async for item in front.alignManyAsync(QUERY, TARGETS, timeout=0.05):
+            results.append(item)
+        return results
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(many())
+    aligner.release.set()
+    front.executor.shutdown(wait=True)
+    # Only the alignment that had started ran.
+    assert aligner.calls == 1
+
+
+def test_process_pool():
+    with ProcessPoolExecutor(1) as executor:
+        front = AsyncAligner(ALIGNER, executor)
+
+        async def run():
+            return [item async for item in front.alignManyAsync(QUERY,
+                                                                TARGETS)]
+        assert sorted(asyncio.run(run())) == \
+            [(k, ALIGNER.align(QUERY, t)) for k, t in enumerate(TARGETS)]
@@ -0,0 +1,237 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+from abc import ABCMeta
+from abc import abstractmethod
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from . import wavefront
+
+
+# Backend ---------------------------------------------------------------------
+
+# A backend computes the cells of an alignment matrix. `fill` completes a
+# matrix whose boundary cells are already set, given the (m x n) grid of
+# substitution scores, and `bestCell` computes the score of the best cell
+# without keeping the whole matrix. Both follow the conventions of
+# `wavefront.fill` and `wavefront.bestCell`: cells are truncated to
+# integers as they are stored, pointer bits are computed before that, and
+# ties of local alignments go to the first cell in row-major order.
+
+class Backend(object):
+    __metaclass__ = ABCMeta
+    name = None
+    # Automatic selection picks the available backend with the highest
+    # priority.
+    priority = 0
+
+    @classmethod
+    def isAvailable(cls):
+        return True
+
+    @abstractmethod
+    def fill(self, f, scores, gapScore, freeEndGaps=False, local=False,
+             pointers=None):
+        return f
+
+    @abstractmethod
+    def bestCell(self, a, b, scoring, gapScore, freeEndGaps=False,
+                 local=False, boundaryGaps=False):
+        return 0, 0, 0
+
+    def __repr__(self):
+        return '%s()' % type(self).__name__
+
+
+class NumpyBackend(Backend):
+    # Vectorized over anti-diagonals, see `wavefront`.
+    name = 'numpy'
+    priority = 10
+
+    def fill(self, f, scores, gapScore, freeEndGaps=False, local=False,
+             pointers=None):
+        return wavefront.fill(f, scores, gapScore, freeEndGaps, local,
+                              pointers)
+
+    def bestCell(self, a, b, scoring, gapScore, freeEndGaps=False,
+                 local=False, boundaryGaps=False):
+        return wavefront.bestCell(a, b, scoring, gapScore, freeEndGaps,
+                                  local, boundaryGaps)
+
+
+class RowBackend(Backend):
+    # Backends that compute one row at a time with an explicit loop over
+    # its cells. Subclasses only provide the row kernel.
+
+    @abstractmethod
+    def fillRow(self, up, current, scores, gapScore, freeLeft, freeUp,
+                local, moves):
+        # Compute current[1:] from the row above, with current[0] set. Left
+        # moves are free when `freeLeft` and the up move of the last cell
+        # is free when `freeUp`. `moves` receives pointer bits unless it is
+        # None.
+        pass
+
+    def fill(self, f, scores, gapScore, freeEndGaps=False, local=False,
+             pointers=None):
+        m, n = scores.shape
+        if n == 0:
+            return f
+        for i in range(1, m + 1):
+            self.fillRow(f[i - 1], f[i], scores[i - 1], gapScore,
+                         freeEndGaps and i == m, freeEndGaps, local,
+                         None if pointers is None else pointers[i])
+        return f
+
+    def bestCell(self, a, b, scoring, gapScore, freeEndGaps=False,
+                 local=False, boundaryGaps=False):
+        # Only one row is kept. When b is the longer sequence, the columns
+        # are swept instead, as rows of the transposed matrix, so the memory
+        # is linear in the shorter sequence. Free end gaps and boundary gaps
+        # are symmetric under transposition.
+        transposed = len(b) > len(a)
+        if transposed:
+            a, b = b, a
+        m = len(a)
+        n = len(b)
+        previous = numpy.zeros(n + 1, int)
+        current = numpy.zeros(n + 1, int)
+        if boundaryGaps:
+            for j in range(1, n + 1):
+                previous[j] = previous[j - 1] + gapScore
+        best = 0
+        bestI = bestJ = 0
+        for i in range(1, m + 1):
+            current[0] = previous[0] + gapScore if boundaryGaps else 0
+            if n > 0:
+                repeated = a[numpy.full(n, i - 1, int)]
+                if transposed:
+                    scores = scoring.scorePairs(b, repeated)
+                else:
+                    scores = scoring.scorePairs(repeated, b)
+                self.fillRow(previous, current, scores, gapScore,
+                             freeEndGaps and i == m, freeEndGaps, local,
+                             None)
+            if local:
+                j = int(current.argmax())
+                # Ties go to the first cell in row-major order of the
+                # original matrix.
+                cell = (j, i) if transposed else (i, j)
+                if current[j] > best or (current[j] == best and best > 0
+                                         and cell < (bestI, bestJ)):
+                    best = current[j]
+                    bestI, bestJ = cell
+            previous, current = current, previous
+        if local:
+            return best, bestI, bestJ
+        if transposed:
+            return previous[-1], n, m
+        return previous[-1], m, n
+
+
+def _fillRow(up, current, scores, gapScore, freeLeft, freeUp, local,
+             moves, recordMoves):
+    # Plain loop shared by the reference backend and the Numba backend.
+    n = len(scores)
+    leftScore = 0 if freeLeft else gapScore
+    for j in range(1, n + 1):
+        upScore = 0 if freeUp and j == n else gapScore
+        ab = up[j - 1] + scores[j - 1]
+        ga = current[j - 1] + leftScore
+        gb = up[j] + upScore
+        best = max(ab, ga, gb)
+        if local and best < 0:
+            best = 0
+        current[j] = best
+        if recordMoves:
+            bits = 0
+            if ab == best:
+                bits |= wavefront.DIAGONAL_MOVE
+            if ga == best:
+                bits |= wavefront.LEFT_MOVE
+            if gb == best:
+                bits |= wavefront.UP_MOVE
+            moves[j] = bits
+
+
+class PythonBackend(RowBackend):
+    # Reference implementation. Slow, but obviously correct.
+    name = 'python'
+    priority = 0
+
+    def fillRow(self, up, current, scores, gapScore, freeLeft, freeUp,
+                local, moves):
+        _fillRow(up, current, scores, gapScore, freeLeft, freeUp, local,
+                 moves, moves is not None)
+
+
+# The compiled kernel is created on first use. It is compiled again for
+# every new combination of argument types, such as integer and fractional
+# scores.
+_compiledFillRow = None
+
+
+class NumbaBackend(RowBackend):
+    # The reference loop compiled with Numba, if it is installed.
+    name = 'numba'
+    priority = 20
+    # Passed to the kernel instead of None when no pointers are recorded.
+    noMoves = numpy.zeros(0, numpy.uint8)
+
+    @classmethod
+    def isAvailable(cls):
+        return numba is not None
+
+    def fillRow(self, up, current, scores, gapScore, freeLeft, freeUp,
+                local, moves):
+        global _compiledFillRow
+        if _compiledFillRow is None:
+            _compiledFillRow = numba.njit(cache=True)(_fillRow)
+        if moves is None:
+            _compiledFillRow(up, current, scores, gapScore, freeLeft, freeUp,
+                             local, self.noMoves, False)
+        else:
+            _compiledFillRow(up, current, scores, gapScore, freeLeft, freeUp,
+                             local, moves, True)
+
+
+# Registry --------------------------------------------------------------------
+
+_backends = dict()
+
+
+def register(backend):
+    _backends[backend.name] = backend
+
+
+def available():
+    # Names of the usable backends, most preferred first.
+    backends = [b for b in _backends.values() if b.isAvailable()]
+    backends.sort(key=lambda b: -b.priority)
+    return [b.name for b in backends]
+
+
+def get(backend=None):
+    # Accepts a backend, a backend name, or None (or 'auto') for the best
+    # available one.
+    if isinstance(backend, Backend):
+        return backend
+    if backend is None or backend == 'auto':
+        backend = available()[0]
+    if backend not in _backends:
+        raise ValueError('unknown backend %r' % (backend,))
+    if not _backends[backend].isAvailable():
+        raise ValueError('backend %r is not available' % (backend,))
+    return _backends[backend]
+
+
+register(PythonBackend())
+register(NumpyBackend())
+register(NumbaBackend())
@@ -0,0 +1,126 @@
+import random
+
+import numpy
+import pytest
+
+from . import backends
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .sequencealigner import SimpleScoring
+from .sequencealigner import GlobalSequenceAligner
+from .sequencealigner import StrictGlobalSequenceAligner
+from .sequencealigner import LocalSequenceAligner
+
+
+REFERENCE = backends.get('python')
+
+MODES = [
+    dict(freeEndGaps=True),
+    dict(boundaryGaps=True),
+    dict(local=True),
+]
+
+
+def _randomCases(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        m = rng.randint(0, 12)
+        n = rng.randint(0, 12)
+        a = numpy.array([rng.randint(0, 3) for _ in range(m)], int)
+        b = numpy.array([rng.randint(0, 3) for _ in range(n)], int)
+        scoring = SimpleScoring(rng.choice([1, 2, 1.5]),
+                                rng.choice([-1, 0, -0.5]))
+        gapScore = rng.choice([-1, -2, -0.7])
+        yield a, b, scoring, gapScore
+
+
+def _fill(backend, a, b, scoring, gapScore, boundaryGaps=False, **kwargs):
+    m = len(a)
+    n = len(b)
+    f = numpy.zeros((m + 1, n + 1), int)
+    pointers = numpy.zeros((m + 1, n + 1), numpy.uint8)
+    if boundaryGaps:
+        for i in range(1, m + 1):
+            f[i, 0] = f[i - 1, 0] + gapScore
+        for j in range(1, n + 1):
+            f[0, j] = f[0, j - 1] + gapScore
+    equal = numpy.equal.outer(a, b)
+    scores = numpy.where(equal, scoring.matchScore, scoring.mismatchScore)
+    backend.fill(f, scores, gapScore, pointers=pointers, **kwargs)
+    return f, pointers
+
+
+@pytest.mark.parametrize('name', backends.available())
+def test_fill_conforms(name):
+    backend = backends.get(name)
+    for a, b, scoring, gapScore in _randomCases(100):
+        for mode in MODES:
+            f, pointers = _fill(backend, a, b, scoring, gapScore, **mode)
+            expectedF, expectedPointers = _fill(REFERENCE, a, b, scoring,
+                                                gapScore, **mode)
+            assert (f == expectedF).all()
+            assert (pointers == expectedPointers).all()
+
+
+@pytest.mark.parametrize('name', backends.available())
+def test_best_cell_conforms(name):
+    backend = backends.get(name)
+    for a, b, scoring, gapScore in _randomCases(100, seed=1):
+        for mode in MODES:
+            assert backend.bestCell(a, b, scoring, gapScore, **mode) == \
+                REFERENCE.bestCell(a, b, scoring, gapScore, **mode)
+
+
+@pytest.mark.parametrize('name', backends.available())
+def test_aligners_conform(name):
+    vocab = Vocabulary()
+    first = vocab.encodeSequence(Sequence('xabcabcyabxc'))
+    second = vocab.encodeSequence(Sequence('abcaxbcz'))
+    scoring = SimpleScoring(3, -1)
+    for aligner in (GlobalSequenceAligner, StrictGlobalSequenceAligner,
+                    LocalSequenceAligner):
+        actual = aligner(scoring, -2, backend=name)
+        expected = aligner(scoring, -2, backend=REFERENCE)
+        assert actual.align(first, second) == expected.align(first, second)
+        score, alignments = actual.align(first, second, backtrace=True)
+        expectedScore, expectedAlignments = expected.align(
+            first, second, backtrace=True)
+        assert score == expectedScore
+        assert [a.key() for a in alignments] == \
+            [a.key() for a in expectedAlignments]
+
+
+class RowRecordingBackend(backends.PythonBackend):
+    # Records the lengths of the rows it computes.
+
+    def __init__(self):
+        self.rowLengths = set()
+
+    def fillRow(self, up, current, scores, gapScore, freeLeft, freeUp,
+                local, moves):
+        self.rowLengths.add(len(current))
+        super(RowRecordingBackend, self).fillRow(
+            up, current, scores, gapScore, freeLeft, freeUp, local, moves)
+
+
+def test_best_cell_keeps_shorter_row():
+    a = numpy.array([0, 1, 2, 1, 0, 2, 2, 1, 0, 1], int)
+    b = numpy.array([1, 2, 1], int)
+    scoring = SimpleScoring(2, -1)
+    for first, second in ((a, b), (b, a)):
+        for mode in MODES:
+            backend = RowRecordingBackend()
+            assert backend.bestCell(first, second, scoring, -1, **mode) == \
+                backends.get('numpy').bestCell(first, second, scoring, -1,
+                                               **mode)
+            assert backend.rowLengths == {len(b) + 1}
+
+
+def test_selection():
+    assert backends.get().name == backends.available()[0]
+    assert backends.get('auto') is backends.get()
+    assert backends.get(REFERENCE) is REFERENCE
+    assert 'python' in backends.available()
+    assert 'numpy' in backends.available()
+    with pytest.raises(ValueError):
+        backends.get('missing')
@@ -0,0 +1,149 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+
+# Value of the cells outside of the band. It is low enough to never win a
+# maximum and high enough to not overflow when scores are added to it.
+UNREACHABLE = numpy.iinfo(int).min // 4
+
+# Adaptive bands start this far from the diagonal and double from there.
+INITIAL_BAND = 8
+
+
+# Band ------------------------------------------------------------------------
+
+class BandedMatrix(object):
+    # Cells (i, j) of an (m + 1) x (n + 1) alignment matrix with
+    # lo <= j - i <= hi. Row i is stored as cells[i, 1:-1] with one
+    # unreachable cell padding each side, so that neighbours of a cell on
+    # the band edge can be read without bounds checks.
+
+    def __init__(self, m, n, lo, hi):
+        self.shape = (m + 1, n + 1)
+        self.lo = lo
+        self.hi = hi
+        self.cells = numpy.full((m + 1, hi - lo + 3), UNREACHABLE, int)
+
+    @classmethod
+    def aroundDiagonal(cls, m, n, k):
+        # The smallest band that contains both corners, widened by k.
+        return cls(m, n, min(0, n - m) - k, max(0, n - m) + k)
+
+    def width(self):
+        return self.hi - self.lo + 1
+
+    def covers(self, i, j):
+        m, n = self.shape
+        return 0 <= i < m and 0 <= j < n and self.lo <= j - i <= self.hi
+
+    def coversAll(self):
+        m, n = self.shape
+        return self.lo <= 1 - m and self.hi >= n - 1
+
+    def max(self):
+        return self.cells.max()
+
+    def __getitem__(self, item):
+        i, j = item
+        m, n = self.shape
+        if i < 0:
+            i += m
+        if j < 0:
+            j += n
+        if self.covers(i, j):
+            return self.cells[i, j - i - self.lo + 1]
+        else:
+            return UNREACHABLE
+
+    def __setitem__(self, item, value):
+        i, j = item
+        if not self.covers(i, j):
+            raise IndexError('cell %r is outside of the band' % (item,))
+        self.cells[i, j - i - self.lo + 1] = value
+
+
+def fill(f, a, b, scoring, gapScore, freeEndGaps=False, local=False,
+         boundaryGaps=False):
+    m = len(a)
+    n = len(b)
+    lo = f.lo
+    width = f.width()
+    cells = f.cells.reshape(-1)
+
+    # Boundary cells.
+    value = 0
+    for j in range(0, min(n, f.hi) + 1):
+        if j >= lo:
+            f[0, j] = value
+        if boundaryGaps:
+            value += gapScore
+            value = int(value)
+    value = 0
+    for i in range(0, min(m, -lo) + 1):
+        if i >= -f.hi:
+            f[i, 0] = value
+        if boundaryGaps:
+            value += gapScore
+            value = int(value)
+
+    # Interior cells, one anti-diagonal at a time. Cell (i, d - i) is
+    # stored at flat index i * width + d - lo + 1, so consecutive cells of
+    # an anti-diagonal are `width` elements apart.
+    rowWidth = width + 2
+    for d in range(2, m + n + 1):
+        ilo = max(1, d - n, (d - f.hi + 1) // 2)
+        ihi = min(m, d - 1, (d - lo) // 2)
+        if ilo > ihi:
+            continue
+        start = ilo * width + d - lo + 1
+        stop = ihi * width + d - lo + 2
+
+        diagonal = cells[start - rowWidth:stop - rowWidth:width]
+        left = cells[start - 1:stop - 1:width]
+        up = cells[start - rowWidth + 1:stop - rowWidth + 1:width]
+
+        # Match elements.
+        ab = diagonal + scoring.scorePairs(a[ilo - 1:ihi],
+                                           b[d - ihi - 1:d - ilo][::-1])
+
+        # Gap on first sequence.
+        ga = left + gapScore
+        if freeEndGaps and ihi == m:
+            ga[-1] = left[-1]
+
+        # Gap on second sequence.
+        gb = up + gapScore
+        if freeEndGaps and d - ilo == n:
+            gb[0] = up[0]
+
+        best = numpy.maximum(ab, numpy.maximum(ga, gb))
+        if local:
+            best = numpy.maximum(best, 0)
+        cells[start:stop:width] = best
+    return f
+
+
+def substitutionBound(a, b, scoring):
+    # The highest score any pair of elements of `a` and `b` can get.
+    if len(a) == 0 or len(b) == 0:
+        return 0
+    firsts = numpy.unique(a)
+    seconds = numpy.unique(b)
+    scores = scoring.scorePairs(numpy.repeat(firsts, len(seconds)),
+                                numpy.tile(seconds, len(firsts)))
+    return scores.max()
+
+
+def outsideBound(m, n, k, maxScore, gapScore):
+    # Upper bound of the strict global score of any path leaving the band
+    # `BandedMatrix.aroundDiagonal(m, n, k)`. Such a path makes at least
+    # k + 1 gaps on each side of the diagonal in addition to the |m - n|
+    # gaps every path makes, and it has that many fewer matches.
+    matches = max(0, min(m, n) - k - 1)
+    gaps = abs(m - n) + 2 * (k + 1)
+    return max(maxScore, 0) * matches + gapScore * gaps
+
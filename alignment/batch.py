@@ -0,0 +1,278 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .sequence import EncodedSequence
+from . import database
+
+
+# Packing ---------------------------------------------------------------------
+
+# Encoded sequences are shipped to worker processes as one concatenated code
+# array with offsets, which pickles much faster than a list of sequences.
+
+def pack(sequences):
+    offsets = numpy.zeros(len(sequences) + 1, int)
+    numpy.cumsum([len(s) for s in sequences], out=offsets[1:])
+    if sequences:
+        codes = numpy.concatenate([s.asArray() for s in sequences])
+    else:
+        codes = numpy.zeros(0, int)
+    ids = [s.id for s in sequences]
+    return codes, offsets, ids
+
+
+def unpack(codes, offsets, ids):
+    return [EncodedSequence(codes[offsets[k]:offsets[k + 1]], id=ids[k])
+            for k in range(len(ids))]
+
+
+def chunks(count, chunksize):
+    return [(start, min(start + chunksize, count))
+            for start in range(0, count, chunksize)]
+
+
+# Workers ---------------------------------------------------------------------
+
+# State of the current worker process, set once by the pool initializer.
+_worker = dict()
+
+
+def initWorker(aligner, query, targets=None, store=None):
+    _worker['aligner'] = aligner
+    _worker['query'] = query
+    _worker['targets'] = targets
+    _worker['store'] = store
+
+
+def alignPacked(codes, offsets, ids, backtrace):
+    return alignSequences(unpack(codes, offsets, ids), backtrace)
+
+
+def alignRange(start, stop, backtrace):
+    return alignSequences(_worker['targets'][start:stop], backtrace)
+
+
+def alignSequences(targets, backtrace):
+    return alignTargets(_worker['aligner'], _worker['query'], targets,
+                        backtrace, _worker.get('store'))
+
+
+def alignTargets(aligner, query, targets, backtrace, store=None):
+    # Only the scores missing from the store are computed. Alignments with
+    # backtrace are never stored.
+    if store is None or backtrace:
+        return [aligner.align(query, target, backtrace)
+                for target in targets]
+    from .scorestore import storedScores
+    return storedScores(
+        aligner, store, [(query, target) for target in targets],
+        lambda missing: [aligner.align(query, targets[k])
+                         for k in missing])
+
+
+def alignPackedPairs(firsts, seconds, backtrace):
+    # Aligns the k-th packed first sequence with the k-th packed second one.
+    aligner = _worker['aligner']
+    return [aligner.align(first, second, backtrace)
+            for first, second in zip(unpack(*firsts), unpack(*seconds))]
+
+
+# Batch -----------------------------------------------------------------------
+
+def alignMany(aligner, query, targets, workers=None, chunksize=None,
+              backtrace=False, topK=None, store=None):
+    # Scores are looked up in and added to `store`, a ScoreStore, if given.
+    if not _isStored(targets):
+        targets = list(targets)
+    if topK is None:
+        return _alignAll(aligner, query, targets, workers, chunksize,
+                         backtrace, store)
+
+    # Rank by score first and only backtrace the winners.
+    scores = numpy.array(_alignAll(aligner, query, targets, workers,
+                                   chunksize, False, store))
+    order = numpy.argsort(-scores, kind='mergesort')[:topK]
+    if backtrace:
+        return [(int(k), aligner.align(query, targets[k], True))
+                for k in order]
+    else:
+        return [(int(k), scores[k]) for k in order]
+
+
+def _alignAll(aligner, query, targets, workers, chunksize, backtrace,
+              store=None):
+    if not workers or workers <= 1 or len(targets) <= 1:
+        return alignTargets(aligner, query, targets, backtrace, store)
+
+    from concurrent.futures import ProcessPoolExecutor
+    if chunksize is None:
+        chunksize = max(1, -(-len(targets) // (workers * 4)))
+    # Stored databases are sent by path and workers read their chunks from
+    # the memory-mapped file.
+    stored = _isStored(targets)
+    encoded = not stored and all(isinstance(t, EncodedSequence)
+                                 for t in targets)
+    results = list()
+    # Every worker looks up the scores of its own chunks in the store.
+    initargs = (aligner, query, targets if stored else None, store)
+    with ProcessPoolExecutor(workers, initializer=initWorker,
+                             initargs=initargs) as executor:
+        futures = list()
+        for start, stop in chunks(len(targets), chunksize):
+            if stored:
+                futures.append(executor.submit(
+                    alignRange, start, stop, backtrace))
+            elif encoded:
+                codes, offsets, ids = pack(targets[start:stop])
+                futures.append(executor.submit(
+                    alignPacked, codes, offsets, ids, backtrace))
+            else:
+                futures.append(executor.submit(
+                    alignSequences, targets[start:stop], backtrace))
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+# All pairs -------------------------------------------------------------------
+
+def tiles(count, tileSize, symmetric=True):
+    return [(rowStart, rowStop, columnStart, columnStop)
+            for rowStart, rowStop in chunks(count, tileSize)
+            for columnStart, columnStop in chunks(count, tileSize)
+            if not symmetric or columnStart >= rowStart]
+
+
+def scoreTile(aligner, rows, columns, tile, symmetric=True, store=None):
+    rowStart, rowStop, columnStart, columnStop = tile
+    block = numpy.zeros((rowStop - rowStart, columnStop - columnStart), int)
+    cells = [(i - rowStart, j - columnStart)
+             for i in range(rowStart, rowStop)
+             for j in range(columnStart, columnStop)
+             if not symmetric or j >= i]
+    if store is None:
+        for i, j in cells:
+            block[i, j] = aligner.align(rows[i], columns[j])
+        return block
+
+    from .scorestore import storedScores
+    scores = storedScores(
+        aligner, store, [(rows[i], columns[j]) for i, j in cells],
+        lambda missing: [aligner.align(rows[cells[k][0]], columns[cells[k][1]])
+                         for k in missing])
+    for (i, j), score in zip(cells, scores):
+        block[i, j] = score
+    return block
+
+
+def storeTile(out, tile, block, symmetric=True):
+    rowStart, rowStop, columnStart, columnStop = tile
+    if symmetric and rowStart == columnStart:
+        block = numpy.triu(block) + numpy.triu(block, 1).T
+    out[rowStart:rowStop, columnStart:columnStop] = block
+    if symmetric:
+        out[columnStart:columnStop, rowStart:rowStop] = block.T
+
+
+def initPairwiseWorker(aligner, name, dtype, offsets, ids, store=None):
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(name=name)
+    _worker['aligner'] = aligner
+    _worker['store'] = store
+    _worker['memory'] = memory
+    _worker['codes'] = numpy.ndarray((offsets[-1],), dtype, memory.buf)
+    _worker['offsets'] = offsets
+    _worker['ids'] = ids
+
+
+def initDatabaseWorker(aligner, sequences, store=None):
+    _worker['aligner'] = aligner
+    _worker['store'] = store
+    _worker['codes'] = sequences.codes
+    _worker['offsets'] = sequences.offsets
+    _worker['ids'] = sequences.ids
+
+
+def scoreSharedTile(tile, symmetric):
+    codes = _worker['codes']
+    offsets = _worker['offsets']
+    ids = _worker['ids']
+    rowStart, rowStop, columnStart, columnStop = tile
+    rows = unpack(codes, offsets[rowStart:rowStop + 1],
+                  ids[rowStart:rowStop])
+    columns = unpack(codes, offsets[columnStart:columnStop + 1],
+                     ids[columnStart:columnStop])
+    return scoreTile(_worker['aligner'], rows, columns, tile, symmetric,
+                     _worker.get('store'))
+
+
+def pairwiseScores(aligner, sequences, workers=None, tileSize=64,
+                   symmetric=None, out=None, filename=None, store=None):
+    # Scores of all pairs of sequences as a matrix. Only the upper triangle
+    # is computed when the aligner is symmetric, which the aligner decides
+    # unless `symmetric` is given. The matrix is memory-mapped to `filename`
+    # when given. Like alignMany, every worker looks up the scores of its
+    # tiles in `store` and adds the missing ones.
+    if symmetric is None:
+        symmetric = aligner.isSymmetric()
+    if not _isStored(sequences):
+        sequences = list(sequences)
+    count = len(sequences)
+    if out is None:
+        if filename is None:
+            out = numpy.zeros((count, count), int)
+        else:
+            out = numpy.memmap(filename, int, 'w+', shape=(count, count))
+    work = tiles(count, tileSize, symmetric)
+
+    if not workers or workers <= 1 or len(work) <= 1:
+        for tile in work:
+            rowStart, rowStop, columnStart, columnStop = tile
+            block = scoreTile(aligner, sequences[rowStart:rowStop],
+                              sequences[columnStart:columnStop], tile,
+                              symmetric, store)
+            storeTile(out, tile, block, symmetric)
+        return out
+
+    from concurrent.futures import ProcessPoolExecutor
+    if _isStored(sequences):
+        # Workers memory-map the database themselves.
+        with ProcessPoolExecutor(workers, initializer=initDatabaseWorker,
+                                 initargs=(aligner, sequences, store)) \
+                as executor:
+            _storeTiles(out, work, symmetric, executor)
+        return out
+
+    from multiprocessing import shared_memory
+    codes, offsets, ids = pack(sequences)
+    memory = shared_memory.SharedMemory(create=True,
+                                        size=max(1, codes.nbytes))
+    try:
+        shared = numpy.ndarray(codes.shape, codes.dtype, memory.buf)
+        shared[:] = codes
+        del codes
+        initargs = (aligner, memory.name, shared.dtype, offsets, ids, store)
+        with ProcessPoolExecutor(workers, initializer=initPairwiseWorker,
+                                 initargs=initargs) as executor:
+            _storeTiles(out, work, symmetric, executor)
+        del shared
+    finally:
+        memory.close()
+        memory.unlink()
+    return out
+
+
+def _storeTiles(out, work, symmetric, executor):
+    futures = [(tile, executor.submit(scoreSharedTile, tile, symmetric))
+               for tile in work]
+    for tile, future in futures:
+        storeTile(out, tile, future.result(), symmetric)
+
+
+def _isStored(sequences):
+    return isinstance(sequences, database.SequenceDatabase) \
+        and sequences.path is not None
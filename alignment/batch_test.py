@@ -0,0 +1,73 @@
+from .sequence import EncodedSequence
+from .sequencealigner import MatrixScoring
+from .sequencealigner import GlobalSequenceAligner
+from .batch import pack
+from .batch import unpack
+from .testing import ALIGNER
+from .testing import SEQUENCES
+
+
+QUERY = SEQUENCES[0]
+TARGETS = SEQUENCES
+
+
+def test_pack_round_trip():
+    codes, offsets, ids = pack(TARGETS)
+    assert len(codes) == sum(len(t) for t in TARGETS)
+    assert [(s.key(), s.id) for s in unpack(codes, offsets, ids)] == \
+        [(t.key(), t.id) for t in TARGETS]
+
+
+def test_align_many_keeps_input_order():
+    expected = [ALIGNER.align(QUERY, t) for t in TARGETS]
+    assert ALIGNER.alignMany(QUERY, TARGETS) == expected
+    assert ALIGNER.alignMany(QUERY, TARGETS, workers=2, chunksize=2) == \
+        expected
+
+
+def test_align_many_with_backtrace():
+    results = ALIGNER.alignMany(QUERY, TARGETS, workers=2, backtrace=True)
+    for target, (score, alignments) in zip(TARGETS, results):
+        expectedScore, expectedAlignments = ALIGNER.align(
+            QUERY, target, backtrace=True)
+        assert score == expectedScore
+        assert [a.key() for a in alignments] == \
+            [a.key() for a in expectedAlignments]
+
+
+def test_align_many_top_k():
+    top = ALIGNER.alignMany(QUERY, TARGETS, topK=2)
+    assert [k for k, _ in top] == [0, 3]
+    assert [score for _, score in top] == [12, 10]
+    top = ALIGNER.alignMany(QUERY, TARGETS, topK=1, backtrace=True)
+    assert top[0][0] == 0
+    score, alignments = top[0][1]
+    assert score == 12
+    assert alignments[0].key() == (QUERY.key(), TARGETS[0].key())
+
+
+def test_pairwise_scores():
+    sequences = [QUERY] + TARGETS
+    expected = [[ALIGNER.align(a, b) for b in sequences] for a in sequences]
+    assert ALIGNER.pairwiseScores(sequences, tileSize=3).tolist() == expected
+    assert ALIGNER.pairwiseScores(
+        sequences, workers=2, tileSize=2).tolist() == expected
+
+
+def test_pairwise_scores_asymmetric():
+    aligner = GlobalSequenceAligner(
+        MatrixScoring([[0, 0, 0], [0, 2, 5], [0, -3, 2]]), -2)
+    sequences = [EncodedSequence([1]), EncodedSequence([2])]
+    expected = [[aligner.align(a, b) for b in sequences] for a in sequences]
+    assert expected == [[2, 5], [0, 2]]
+    assert aligner.pairwiseScores(sequences).tolist() == expected
+    assert aligner.pairwiseScores(sequences, workers=2,
+                                  tileSize=1).tolist() == expected
+
+
+def test_pairwise_scores_memory_mapped(tmp_path):
+    sequences = [QUERY] + TARGETS
+    expected = [[ALIGNER.align(a, b) for b in sequences] for a in sequences]
+    scores = ALIGNER.pairwiseScores(sequences, workers=2, tileSize=4,
+                                    filename=str(tmp_path / 'scores'))
+    assert scores.tolist() == expected
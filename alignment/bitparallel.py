@@ -0,0 +1,95 @@
+from .sequence import GAP_CODE
+
+
+# Myers' bit-parallel edit distance -------------------------------------------
+
+# Column j of the edit distance matrix of `a` against `b` is represented by
+# its vertical deltas: bit i of `pv` (`mv`) is set when cell (i + 1, j) is
+# one more (one less) than cell (i, j). Both are Python integers with one
+# bit per element of `a`, so the alphabet and the length of `a` are
+# unbounded. See Hyyro, "A bit-vector algorithm for computing Levenshtein
+# and Damerau edit distances" (2003).
+
+def matchMasks(a):
+    # Bit i of masks[x] is set when a[i] == x.
+    masks = dict()
+    for i, x in enumerate(a.tolist()):
+        masks[x] = masks.get(x, 0) | (1 << i)
+    return masks
+
+
+def columns(a, b):
+    # Yield the vertical deltas (pv, mv) of every column of the matrix,
+    # starting with column 0.
+    m = len(a)
+    mask = (1 << m) - 1
+    masks = matchMasks(a)
+    pv = mask
+    mv = 0
+    yield pv, mv
+    for y in b.tolist():
+        eq = masks.get(y, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        # The top row grows by one in every column.
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        yield pv, mv
+
+
+def distance(a, b):
+    # The pattern is the shorter sequence, which keeps the integers short.
+    if len(a) > len(b):
+        a, b = b, a
+    for pv, mv in columns(a, b):
+        pass
+    # noinspection PyUnboundLocalVariable
+    return len(b) + _popCount(pv) - _popCount(mv)
+
+
+def editColumns(a, b, gap=GAP_CODE):
+    # One optimal alignment as (firstElement, secondElement, score) triples
+    # in forward order, with unit costs. Like the strict global aligner's
+    # first alignment, moves are tried in the order up, left, diagonal.
+    m = len(a)
+    n = len(b)
+    deltas = list(columns(a, b))
+
+    def cell(i, j):
+        pv, mv = deltas[j]
+        low = (1 << i) - 1
+        return j + _popCount(pv & low) - _popCount(mv & low)
+
+    tail = list()
+    i, j = m, n
+    c = cell(i, j)
+    while i > 0 or j > 0:
+        if i > 0:
+            x = cell(i - 1, j)
+            if c == x + 1:
+                tail.append((a[i - 1], gap, -1))
+                i -= 1
+                c = x
+                continue
+        if j > 0:
+            y = cell(i, j - 1)
+            if c == y + 1:
+                tail.append((gap, b[j - 1], -1))
+                j -= 1
+                c = y
+                continue
+        score = 0 if a[i - 1] == b[j - 1] else -1
+        tail.append((a[i - 1], b[j - 1], score))
+        i -= 1
+        j -= 1
+        c += score
+    tail.reverse()
+    return tail
+
+
+def _popCount(x):
+    return bin(x).count('1')
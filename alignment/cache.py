@@ -0,0 +1,156 @@
+import collections
+import threading
+
+from .profile import CompactProfile
+from .profile import Profile
+
+
+DEFAULT_MAX_ENTRIES = 4096
+
+# Rough sizes used to bound the memory of a cache, in bytes: the fixed cost
+# of an entry and the cost of every element of a key or alignment column.
+ENTRY_SIZE = 256
+ELEMENT_SIZE = 8
+COLUMN_SIZE = 32
+
+
+# Keys ------------------------------------------------------------------------
+
+def sequenceKey(sequence):
+    # Content key of a sequence. Profile keys only tell single elements
+    # apart, so profiles are keyed by all of their weights.
+    if isinstance(sequence, (Profile, CompactProfile)):
+        return tuple(frozenset(e.pairs()) for e in sequence)
+    return sequence.key()
+
+
+def estimateSize(key, value):
+    size = ENTRY_SIZE + ELEMENT_SIZE * (len(key[2]) + len(key[3]))
+    if isinstance(value, tuple):
+        score, alignments = value
+        size += sum(COLUMN_SIZE * len(a) for a in alignments)
+    return size
+
+
+# Cache -----------------------------------------------------------------------
+
+class AlignmentCache(object):
+    # Least recently used entries are evicted once there are more than
+    # maxEntries entries or their estimated size exceeds maxBytes. Either
+    # bound can be None. The cache can be shared by several aligners and
+    # threads.
+
+    def __init__(self, maxEntries=DEFAULT_MAX_ENTRIES, maxBytes=None):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Move the entry to the most recently used end.
+            value, size = self.entries.pop(key)
+            self.entries[key] = value, size
+            return value
+
+    def put(self, key, value, size=None):
+        if size is None:
+            size = estimateSize(key, value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if self.maxBytes is not None and size > self.maxBytes:
+                return
+            self.entries[key] = value, size
+            self.size += size
+            while (self.maxEntries is not None
+                   and len(self.entries) > self.maxEntries) \
+                    or (self.maxBytes is not None
+                        and self.size > self.maxBytes):
+                _, (_, evictedSize) = self.entries.popitem(last=False)
+                self.size -= evictedSize
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def statistics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': float(self.hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+            }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+class CachingAligner(object):
+    # Wraps an aligner and reuses the results of earlier calls of `align`
+    # with the same sequence contents and aligner configuration. Cached
+    # alignments are shared between calls and should not be modified.
+    #
+    # Score lookups of symmetric aligners also find the swapped pair. The
+    # aligner decides whether it is symmetric unless `symmetric` is given.
+    #
+    # Scorings keyed by identity are not cached: once such a scoring is
+    # gone, another one can get its id and a shared cache would return its
+    # results.
+
+    def __init__(self, aligner, cache=None, maxEntries=DEFAULT_MAX_ENTRIES,
+                 maxBytes=None, symmetric=None):
+        if not aligner.scoring.hasContentKey():
+            raise ValueError('%s has no content key and cannot be cached'
+                             % type(aligner.scoring).__name__)
+        self.aligner = aligner
+        if cache is None:
+            cache = AlignmentCache(maxEntries, maxBytes)
+        self.cache = cache
+        if symmetric is None:
+            symmetric = aligner.isSymmetric()
+        self.symmetric = symmetric
+
+    def key(self, first, second, backtrace=False):
+        firstKey = sequenceKey(first)
+        secondKey = sequenceKey(second)
+        if backtrace:
+            # Alignments carry the sequence ids.
+            return (self.aligner.key(), True, firstKey, secondKey, first.id,
+                    second.id)
+        # Keys need not be ordered, so the pair is ordered by hash. Pairs with
+        # equal hashes are merely cached twice.
+        if self.symmetric and hash(secondKey) < hash(firstKey):
+            firstKey, secondKey = secondKey, firstKey
+        return self.aligner.key(), False, firstKey, secondKey
+
+    def align(self, first, second, backtrace=False):
+        key = self.key(first, second, backtrace)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.aligner.align(first, second, backtrace)
+            self.cache.put(key, result)
+        return result
+
+    def statistics(self):
+        return self.cache.statistics()
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.aligner)
@@ -0,0 +1,102 @@
+import numpy
+import pytest
+
+from .sequencealigner import Scoring
+from .sequencealigner import SimpleScoring
+from .sequencealigner import MatrixScoring
+from .sequencealigner import GlobalSequenceAligner
+from .sequencealigner import LocalSequenceAligner
+from .profile import Profile
+from .profilealigner import SoftScoring
+from .profilealigner import GlobalProfileAligner
+from .cache import AlignmentCache
+from .cache import CachingAligner
+from .testing import encode
+
+
+def test_keys():
+    assert SimpleScoring(2, -1).key() == SimpleScoring(2, -1).key()
+    assert SimpleScoring(2, -1).key() != SimpleScoring(2, -2).key()
+    matrix = numpy.arange(9).reshape(3, 3)
+    assert MatrixScoring(matrix).key() == MatrixScoring(matrix.copy()).key()
+    assert not MatrixScoring(matrix).isSymmetric()
+    assert MatrixScoring(matrix + matrix.T).isSymmetric()
+    local = LocalSequenceAligner(SimpleScoring(2, -1), -2)
+    assert local.key() != \
+        LocalSequenceAligner(SimpleScoring(2, -1), -2, minScore=3).key()
+    assert local.key() != \
+        GlobalSequenceAligner(SimpleScoring(2, -1), -2).key()
+    assert local.key() == LocalSequenceAligner(SimpleScoring(2, -1), -2,
+                                               backend='python').key()
+
+
+def test_hits_and_misses():
+    a, b, c = encode('a b c d', 'x b c y', 'a b c d')
+    aligner = CachingAligner(LocalSequenceAligner(SimpleScoring(2, -1), -2))
+    expected = aligner.aligner.align(a, b)
+    assert aligner.align(a, b) == expected
+    assert aligner.align(c, b) == expected
+    assert aligner.align(b, a) == expected
+    score, alignments = aligner.align(a, b, backtrace=True)
+    assert aligner.align(a, b, backtrace=True)[1] is alignments
+    # Alignments carry ids, so equal contents with other ids are aligned
+    # again.
+    assert aligner.align(c, b, backtrace=True)[1] is not alignments
+    statistics = aligner.statistics()
+    assert statistics['hits'] == 3
+    assert statistics['misses'] == 3
+    assert statistics['entries'] == 3
+
+
+def test_asymmetric_scoring():
+    a, b = encode('a b', 'b a')
+    matrix = numpy.array([[0, 0, 0], [0, 2, 5], [0, -3, 2]])
+    aligner = CachingAligner(GlobalSequenceAligner(MatrixScoring(matrix), -2))
+    assert not aligner.symmetric
+    assert aligner.align(a, b) == aligner.aligner.align(a, b)
+    assert aligner.align(b, a) == aligner.aligner.align(b, a)
+    assert aligner.statistics()['hits'] == 0
+
+
+def test_profile_keys():
+    first = Profile.fromDict([{1: 1, 2: 1}])
+    second = Profile.fromDict([{1: 3, 2: 1}])
+    query = Profile.fromDict([{1: 1}])
+    aligner = CachingAligner(GlobalProfileAligner(
+        SoftScoring(SimpleScoring(2, -1)), -2))
+    assert aligner.align(first, query) != aligner.align(second, query)
+
+
+def test_identity_keyed_scoring():
+    class ConstantScoring(Scoring):
+        def __call__(self, firstElement, secondElement):
+            return 1
+
+    cache = AlignmentCache()
+    with pytest.raises(ValueError):
+        CachingAligner(LocalSequenceAligner(ConstantScoring(), -2), cache)
+    with pytest.raises(ValueError):
+        CachingAligner(GlobalProfileAligner(SoftScoring(ConstantScoring()),
+                                            -2), cache)
+    assert SoftScoring(SimpleScoring(2, -1)).hasContentKey()
+
+
+def test_eviction():
+    cache = AlignmentCache(maxEntries=2)
+    for k in range(3):
+        cache.put(('aligner', False, (k,), (k,)), k)
+    assert len(cache) == 2
+    assert cache.get(('aligner', False, (0,), (0,))) is None
+    assert cache.get(('aligner', False, (1,), (1,))) == 1
+    cache.put(('aligner', False, (3,), (3,)), 3)
+    assert ('aligner', False, (1,), (1,)) in cache
+    assert ('aligner', False, (2,), (2,)) not in cache
+    assert cache.statistics()['evictions'] == 2
+
+    cache = AlignmentCache(maxEntries=None, maxBytes=1000)
+    for k in range(10):
+        cache.put(('aligner', False, (k,), (k,)), k, size=300)
+    assert len(cache) == 3
+    assert cache.statistics()['bytes'] == 900
+    cache.put(('aligner', False, (), ()), 0, size=2000)
+    assert len(cache) == 3
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .sequence import EncodedSequence
+from . import batch
+
+
+CODES_FILENAME = 'codes.npy'
+OFFSETS_FILENAME = 'offsets.npy'
+IDS_FILENAME = 'ids.json'
+
+
+# Files -----------------------------------------------------------------------
+
+def replaceFile(path, write):
+    # Calls write(f) with a temporary binary file next to `path` and
+    # atomically replaces `path` with it.
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with io.open(temporary, 'wb') as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+# Database --------------------------------------------------------------------
+
+class SequenceDatabase(object):
+    # Encoded sequences packed into one contiguous code array. Record k is
+    # codes[offsets[k]:offsets[k + 1]] and has the id ids[k]. A database is
+    # stored as a directory with the two arrays as .npy files and the ids
+    # as JSON. Opened databases memory-map the arrays, so records are
+    # zero-copy views and the operating system shares the pages between
+    # processes. They are pickled by path, which makes them cheap to send
+    # to worker processes.
+
+    def __init__(self, codes, offsets, ids, path=None):
+        if len(offsets) != len(ids) + 1:
+            raise ValueError('expected %d offsets for %d sequences, got %d'
+                             % (len(ids) + 1, len(ids), len(offsets)))
+        self.codes = codes
+        self.offsets = offsets
+        self.ids = ids
+        self.path = path
+
+    @classmethod
+    def fromSequences(cls, sequences):
+        return cls(*batch.pack(list(sequences)))
+
+    @classmethod
+    def write(cls, path, sequences):
+        cls.fromSequences(sequences).save(path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        codes = numpy.load(os.path.join(path, CODES_FILENAME), mmap_mode=mode)
+        offsets = numpy.load(os.path.join(path, OFFSETS_FILENAME),
+                             mmap_mode=mode)
+        with io.open(os.path.join(path, IDS_FILENAME), encoding='utf-8') as f:
+            ids = json.load(f)
+        return cls(codes, offsets, ids, path)
+
+    def save(self, path):
+        # Files are written next to their targets and renamed into place, so
+        # a database can be saved over the files it has memory-mapped, and
+        # readers of the old files keep seeing them until they reopen.
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        replaceFile(os.path.join(path, CODES_FILENAME),
+                    lambda f: numpy.save(f, self.codes))
+        replaceFile(os.path.join(path, OFFSETS_FILENAME),
+                    lambda f: numpy.save(f, self.offsets))
+        replaceFile(os.path.join(path, IDS_FILENAME),
+                    lambda f: f.write(json.dumps(
+                        self.ids, ensure_ascii=False).encode('utf-8')))
+
+    def get(self, k):
+        return EncodedSequence.fromArray(
+            self.codes[self.offsets[k]:self.offsets[k + 1]], id=self.ids[k])
+
+    def lengths(self):
+        return numpy.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get(k) for k in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('sequence index out of range')
+        return self.get(item)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self.get(k)
+
+    def __getstate__(self):
+        if self.path is None:
+            return self.__dict__
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        if 'codes' in state:
+            self.__dict__.update(state)
+        else:
+            self.__dict__.update(self.open(state['path']).__dict__)
+
+    def __repr__(self):
+        return '%s(%d sequences, %d codes)' % (
+            type(self).__name__, len(self), len(self.codes))
@@ -0,0 +1,64 @@
+import pickle
+
+import numpy
+
+from .database import SequenceDatabase
+from .testing import ALIGNER
+from .testing import SEQUENCES
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'db')
+    db = SequenceDatabase.write(path, SEQUENCES)
+    assert isinstance(db.codes, numpy.memmap)
+    assert len(db) == len(SEQUENCES)
+    assert [(s.key(), s.id) for s in db] == \
+        [(s.key(), s.id) for s in SEQUENCES]
+    assert db[-1].key() == SEQUENCES[-1].key()
+    assert [s.id for s in db[1:3]] == [1, 2]
+    assert list(db.lengths()) == [len(s) for s in SEQUENCES]
+
+
+def test_save_over_opened(tmp_path):
+    path = str(tmp_path / 'db')
+    sequences = SEQUENCES * 1000
+    db = SequenceDatabase.write(path, sequences)
+    db.save(path)
+    # The old mapping stays readable and the saved files are complete.
+    assert [s.key() for s in db] == [s.key() for s in sequences]
+    reopened = SequenceDatabase.open(path)
+    assert [(s.key(), s.id) for s in reopened] == \
+        [(s.key(), s.id) for s in sequences]
+    assert sorted(p.name for p in tmp_path.joinpath('db').iterdir()) == \
+        ['codes.npy', 'ids.json', 'offsets.npy']
+
+
+def test_records_are_views(tmp_path):
+    db = SequenceDatabase.write(str(tmp_path / 'db'), SEQUENCES)
+    record = db[3]
+    assert numpy.shares_memory(record.elements, db.codes)
+    assert not record.elements.flags.writeable
+
+
+def test_pickled_by_path(tmp_path):
+    db = SequenceDatabase.write(str(tmp_path / 'db'), SEQUENCES)
+    data = pickle.dumps(db)
+    assert len(data) < 200
+    copy = pickle.loads(data)
+    assert [s.key() for s in copy] == [s.key() for s in SEQUENCES]
+    memory = SequenceDatabase.fromSequences(SEQUENCES)
+    copy = pickle.loads(pickle.dumps(memory))
+    assert [s.key() for s in copy] == [s.key() for s in SEQUENCES]
+
+
+def test_batch_apis(tmp_path):
+    db = SequenceDatabase.write(str(tmp_path / 'db'), SEQUENCES[1:])
+    query = SEQUENCES[0]
+    expected = [ALIGNER.align(query, s) for s in SEQUENCES[1:]]
+    assert ALIGNER.alignMany(query, db) == expected
+    assert ALIGNER.alignMany(query, db, workers=2, chunksize=2) == expected
+    best = max(range(len(expected)), key=lambda k: (expected[k], -k))
+    assert ALIGNER.alignMany(query, db, topK=1) == [(best, expected[best])]
+    expected = ALIGNER.pairwiseScores(SEQUENCES[1:])
+    assert (ALIGNER.pairwiseScores(db, workers=2, tileSize=2) ==
+            expected).all()
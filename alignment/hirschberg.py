@@ -0,0 +1,139 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .sequence import GAP_CODE
+from . import wavefront
+
+
+# Sub-problems with at most this many cells are solved with a full matrix.
+BASE_CASE_CELLS = 4096
+
+
+# Hirschberg ------------------------------------------------------------------
+
+# The functions below return alignment columns as (firstElement,
+# secondElement, score) triples in forward order. `a` and `b` are element
+# arrays as returned by `BaseSequence.asArray`.
+
+def strictGlobalColumns(a, b, scoring, gapScore, gap=GAP_CODE):
+    columns = list()
+    _divide(a, b, scoring, gapScore, gap, columns)
+    return columns
+
+
+def globalColumns(a, b, scoring, gapScore, gap=GAP_CODE):
+    # Leading and trailing overhangs are free in global alignment. Find the
+    # cell where the optimal path leaves the matrix interior with a forward
+    # pass, the cell where it enters the interior with a backward pass from
+    # there, and align the part in between with Hirschberg's algorithm.
+    m = len(a)
+    n = len(b)
+    lastRow, lastColumn = wavefront.edges(a, b, scoring, gapScore)
+    j = int(lastRow.argmax())
+    i = int(lastColumn.argmax())
+    if lastRow[j] >= lastColumn[i]:
+        endI, endJ = m, j
+    else:
+        endI, endJ = i, n
+
+    startI, startJ = endI, endJ
+    if endI > 0 and endJ > 0:
+        lastRow, lastColumn = wavefront.edges(
+            a[endI - 1::-1], b[endJ - 1::-1], scoring, gapScore,
+            boundaryGaps=True)
+        j = int(lastRow.argmax())
+        i = int(lastColumn.argmax())
+        if lastRow[j] >= lastColumn[i]:
+            startI, startJ = 0, endJ - j
+        else:
+            startI, startJ = endI - i, 0
+
+    return strictGlobalColumns(a[startI:endI], b[startJ:endJ],
+                               scoring, gapScore, gap)
+
+
+def pathScore(columns):
+    # The score of the columns as the alignment matrices compute it, which
+    # truncate the running score to an integer after every column.
+    score = 0
+    for _, _, columnScore in columns:
+        score = int(score + columnScore)
+    return score
+
+
+def _divide(a, b, scoring, gapScore, gap, columns):
+    m = len(a)
+    n = len(b)
+    if m == 0:
+        columns.extend((gap, y, gapScore) for y in b)
+    elif n == 0:
+        columns.extend((x, gap, gapScore) for x in a)
+    elif m == 1:
+        _alignSingle(a, b, scoring, gapScore, gap, columns)
+    elif (m + 1) * (n + 1) <= BASE_CASE_CELLS:
+        _alignSmall(a, b, scoring, gapScore, gap, columns)
+    else:
+        middle = m // 2
+        forward, _ = wavefront.edges(a[:middle], b, scoring, gapScore,
+                                     boundaryGaps=True)
+        backward, _ = wavefront.edges(a[:middle - 1:-1], b[::-1],
+                                      scoring, gapScore, boundaryGaps=True)
+        split = int((forward + backward[::-1]).argmax())
+        _divide(a[:middle], b[:split], scoring, gapScore, gap, columns)
+        _divide(a[middle:], b[split:], scoring, gapScore, gap, columns)
+
+
+def _alignSingle(a, b, scoring, gapScore, gap, columns):
+    n = len(b)
+    x = a[0]
+    scores = scoring.scorePairs(a[numpy.zeros(n, int)], b)
+    k = int(scores.argmax())
+    if scores[k] + (n - 1) * gapScore >= (n + 1) * gapScore:
+        columns.extend((gap, y, gapScore) for y in b[:k])
+        columns.append((x, b[k], scores[k]))
+        columns.extend((gap, y, gapScore) for y in b[k + 1:])
+    else:
+        columns.append((x, gap, gapScore))
+        columns.extend((gap, y, gapScore) for y in b)
+
+
+def _alignSmall(a, b, scoring, gapScore, gap, columns):
+    m = len(a)
+    n = len(b)
+    f = numpy.zeros((m + 1, n + 1), int)
+    for i in range(1, m + 1):
+        f[i, 0] = f[i - 1, 0] + gapScore
+    for j in range(1, n + 1):
+        f[0, j] = f[0, j - 1] + gapScore
+    scores = scoring.scorePairs(a[numpy.repeat(numpy.arange(m), n)],
+                                b[numpy.tile(numpy.arange(n), m)])
+    scores = scores.reshape(m, n)
+    wavefront.fill(f, scores, gapScore)
+
+    # Follow the best move backwards from the bottom right corner.
+    tail = list()
+    i, j = m, n
+    while i > 0 or j > 0:
+        moves = list()
+        if i > 0 and j > 0:
+            moves.append((f[i - 1, j - 1] + scores[i - 1, j - 1], 0))
+        if i > 0:
+            moves.append((f[i - 1, j] + gapScore, 1))
+        if j > 0:
+            moves.append((f[i, j - 1] + gapScore, 2))
+        move = max(moves)[1]
+        if move == 0:
+            tail.append((a[i - 1], b[j - 1], scores[i - 1, j - 1]))
+            i -= 1
+            j -= 1
+        elif move == 1:
+            tail.append((a[i - 1], gap, gapScore))
+            i -= 1
+        else:
+            tail.append((gap, b[j - 1], gapScore))
+            j -= 1
+    columns.extend(reversed(tail))
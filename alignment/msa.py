@@ -0,0 +1,220 @@
+import time
+
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .sequence import GAP_CODE
+from .sequence import EncodedSequence
+from .profile import CompactProfile
+from .sequencealigner import StrictGlobalSequenceAligner
+from .profilealigner import SoftScoring
+from .profilealigner import StrictGlobalProfileAligner
+from . import wavefront
+
+
+# Guide tree ------------------------------------------------------------------
+
+# A guide tree is the list of its merges (left, right). Nodes 0 .. n - 1 are
+# the sequences and the k-th merge creates node n + k, so the last merge is
+# the root.
+
+def distancesFromScores(scores):
+    # Similarity scores to distances, d(i, j) = (s(i, i) + s(j, j)) / 2 -
+    # s(i, j), which is zero for identical sequences. Scores of asymmetric
+    # scorings are averaged over both orders.
+    scores = numpy.asarray(scores, float)
+    scores = (scores + scores.T) / 2.0
+    diagonal = scores.diagonal()
+    distances = (diagonal[:, None] + diagonal[None, :]) / 2.0 - scores
+    numpy.fill_diagonal(distances, 0.0)
+    return numpy.maximum(distances, 0.0)
+
+
+def upgma(distances):
+    d = numpy.array(distances, float)
+    n = len(d)
+    numpy.fill_diagonal(d, numpy.inf)
+    nodes = list(range(n))
+    sizes = numpy.ones(n)
+    merges = list()
+    for k in range(n - 1):
+        i, j = numpy.unravel_index(numpy.argmin(d), d.shape)
+        i, j = min(i, j), max(i, j)
+        merges.append((nodes[i], nodes[j]))
+        # Slot i holds the new cluster and slot j is retired.
+        row = (d[i] * sizes[i] + d[j] * sizes[j]) / (sizes[i] + sizes[j])
+        d[i, :] = row
+        d[:, i] = row
+        d[i, i] = numpy.inf
+        d[j, :] = numpy.inf
+        d[:, j] = numpy.inf
+        sizes[i] += sizes[j]
+        nodes[i] = n + k
+    return merges
+
+
+def neighborJoining(distances):
+    d = numpy.array(distances, float)
+    n = len(d)
+    nodes = list(range(n))
+    active = list(range(n))
+    merges = list()
+    for k in range(n - 1):
+        r = len(active)
+        if r > 2:
+            sub = d[numpy.ix_(active, active)]
+            totals = sub.sum(axis=1)
+            q = (r - 2) * sub - totals[:, None] - totals[None, :]
+            numpy.fill_diagonal(q, numpy.inf)
+            a, b = numpy.unravel_index(numpy.argmin(q), q.shape)
+            a, b = min(a, b), max(a, b)
+        else:
+            a, b = 0, 1
+        i = active[a]
+        j = active[b]
+        merges.append((nodes[i], nodes[j]))
+        row = (d[i] + d[j] - d[i, j]) / 2.0
+        d[i, :] = row
+        d[:, i] = row
+        d[i, i] = 0.0
+        nodes[i] = n + k
+        del active[b]
+    return merges
+
+
+GUIDE_TREES = {
+    'upgma': upgma,
+    'nj': neighborJoining,
+}
+
+
+# Alignment -------------------------------------------------------------------
+
+class MultipleAlignment(object):
+    # `matrix` holds one gapped row of codes per sequence, in input order.
+
+    def __init__(self, matrix, ids, merges, timings):
+        self.matrix = matrix
+        self.ids = ids
+        self.merges = merges
+        self.timings = timings
+
+    def rows(self):
+        return [EncodedSequence.fromArray(row, id=id)
+                for row, id in zip(self.matrix, self.ids)]
+
+    def profile(self):
+        return CompactProfile.fromAlignedRows(self.matrix)
+
+    def __len__(self):
+        return self.matrix.shape[1]
+
+    def __str__(self):
+        return '\n'.join(' '.join(str(e) for e in row) for row in self.matrix)
+
+
+# Aligner ---------------------------------------------------------------------
+
+class ProgressiveAligner(object):
+    # Progressive multiple alignment in three phases: score-only pairwise
+    # alignments of all sequences (in parallel with `workers`), a guide tree
+    # built from the resulting distances, and strict global profile-profile
+    # alignments in tree order. Each merge keeps the first optimal
+    # alignment, so gaps once inserted stay.
+
+    def __init__(self, scoring, gapScore, tree='upgma', workers=None,
+                 backend=None):
+        if tree not in GUIDE_TREES:
+            raise ValueError('unknown guide tree %r' % (tree,))
+        self.tree = tree
+        self.workers = workers
+        self.sequenceAligner = StrictGlobalSequenceAligner(
+            scoring, gapScore, backend=backend)
+        self.profileAligner = StrictGlobalProfileAligner(
+            SoftScoring(scoring), gapScore, usePointers=True,
+            backend=backend)
+
+    def align(self, sequences):
+        sequences = list(sequences)
+        if not sequences:
+            raise ValueError('at least one sequence is required')
+        timings = dict()
+
+        start = time.time()
+        scores = self.sequenceAligner.pairwiseScores(sequences,
+                                                     workers=self.workers)
+        distances = distancesFromScores(scores)
+        timings['distances'] = time.time() - start
+
+        start = time.time()
+        merges = GUIDE_TREES[self.tree](distances)
+        timings['tree'] = time.time() - start
+
+        start = time.time()
+        matrix = self.alignTree(sequences, merges)
+        timings['merges'] = time.time() - start
+
+        return MultipleAlignment(matrix, [s.id for s in sequences], merges,
+                                 timings)
+
+    def alignTree(self, sequences, merges):
+        arrays = [s.asArray() for s in sequences]
+        dtype = numpy.result_type(*arrays)
+        # Each cluster is the list of its sequences and their gapped rows.
+        clusters = [([k], numpy.array(a, dtype)[None, :])
+                    for k, a in enumerate(arrays)]
+        for left, right in merges:
+            leftIndices, leftRows = clusters[left]
+            rightIndices, rightRows = clusters[right]
+            clusters[left] = clusters[right] = None
+            clusters.append((leftIndices + rightIndices,
+                             self.mergeRows(leftRows, rightRows)))
+        indices, rows = clusters[-1]
+        matrix = numpy.empty_like(rows)
+        matrix[indices] = rows
+        return matrix
+
+    def mergeRows(self, first, second):
+        f, pointers = self.profileAligner.computeBacktraceMatrices(
+            CompactProfile.fromAlignedRows(first),
+            CompactProfile.fromAlignedRows(second))
+        firstColumns, secondColumns = _path(pointers)
+        return numpy.vstack([_expand(first, firstColumns),
+                             _expand(second, secondColumns)])
+
+
+def _path(pointers):
+    # The columns of the first strict global alignment, with the move
+    # priority of StrictGlobalSequenceAligner.backtraceMoves (up, left,
+    # diagonal), as the column indices of both sides, -1 for gaps.
+    i, j = pointers.shape[0] - 1, pointers.shape[1] - 1
+    firstColumns = list()
+    secondColumns = list()
+    while i > 0 or j > 0:
+        bits = pointers[i, j]
+        if i > 0 and bits & wavefront.UP_MOVE:
+            i -= 1
+            firstColumns.append(i)
+            secondColumns.append(-1)
+        elif j > 0 and bits & wavefront.LEFT_MOVE:
+            j -= 1
+            firstColumns.append(-1)
+            secondColumns.append(j)
+        else:
+            i -= 1
+            j -= 1
+            firstColumns.append(i)
+            secondColumns.append(j)
+    return (numpy.array(firstColumns[::-1], int),
+            numpy.array(secondColumns[::-1], int))
+
+
+def _expand(rows, columns):
+    expanded = numpy.full((len(rows), len(columns)), GAP_CODE, rows.dtype)
+    present = columns >= 0
+    expanded[:, present] = rows[:, columns[present]]
+    return expanded
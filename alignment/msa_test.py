@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .sequencealigner import SimpleScoring
+from .msa import ProgressiveAligner
+from .msa import distancesFromScores
+from .msa import neighborJoining
+from .msa import upgma
+
+
+DISTANCES = numpy.array([
+    [0, 5, 9, 9, 8],
+    [5, 0, 10, 10, 9],
+    [9, 10, 0, 8, 7],
+    [9, 10, 8, 0, 3],
+    [8, 9, 7, 3, 0],
+])
+
+
+def test_distances_from_scores():
+    scores = numpy.array([[10, 4], [4, 6]])
+    assert numpy.allclose(distancesFromScores(scores), [[0, 4], [4, 0]])
+
+
+def test_guide_trees():
+    assert upgma(DISTANCES) == [(3, 4), (0, 1), (2, 5), (6, 7)]
+    merges = neighborJoining(DISTANCES)
+    assert merges[0] == (0, 1)
+    assert len(merges) == 4
+    assert upgma(numpy.zeros((1, 1))) == []
+
+
+@pytest.mark.parametrize('tree', ['upgma', 'nj'])
+def test_progressive_alignment(tree):
+    vocab = Vocabulary()
+    sentences = [
+        'user root logged in from host',
+        'user admin logged in from host',
+        'user root logged out',
+        'session opened for user root',
+        'user guest logged in',
+    ]
+    sequences = [vocab.encodeSequence(Sequence(s.split(), id=k))
+                 for k, s in enumerate(sentences)]
+    aligner = ProgressiveAligner(SimpleScoring(2, -1), -2, tree=tree)
+    result = aligner.align(sequences)
+    assert set(result.timings) == {'distances', 'tree', 'merges'}
+    assert len(result.merges) == len(sequences) - 1
+    for sequence, row in zip(sequences, result.rows()):
+        assert row.id == sequence.id
+        assert len(row) == len(result)
+        codes = row.asArray()
+        assert list(codes[codes != 0]) == list(sequence.asArray())
+    # The two sentences that differ in one word are aligned without gaps.
+    assert (result.matrix[0] != 0).sum() == 6
+    assert ((result.matrix[0] != 0) == (result.matrix[1] != 0)).all()
+    assert len(result.profile()) == len(result)
+
+
+def test_unknown_tree():
+    with pytest.raises(ValueError):
+        ProgressiveAligner(SimpleScoring(2, -1), -2, tree='missing')
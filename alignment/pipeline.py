@@ -0,0 +1,229 @@
+import collections
+import io
+import itertools
+import json
+import os
+
+from six import string_types
+
+from .sequence import Sequence
+from .sequence import EncodedSequence
+from .vocabulary import elementFromJson
+from . import batch
+
+
+DEFAULT_CHUNK_SIZE = 256
+
+JSON_EXTENSIONS = ('.jsonl', '.ndjson', '.json')
+FASTA_EXTENSIONS = ('.fa', '.fasta', '.fna', '.faa', '.ffn')
+
+
+# Readers ---------------------------------------------------------------------
+
+# Readers are generators that take a path or an open text file and yield one
+# Sequence at a time, so files of any size can be streamed.
+
+def readTokens(source, separator=None):
+    # One sequence per non-empty line, split into tokens by `separator`
+    # (whitespace by default). Sequences are numbered from 0.
+    count = 0
+    for line in _lines(source):
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield Sequence(line.split(separator), id=count)
+            count += 1
+
+
+def readJsonLines(source, elementsKey='elements', idKey='id'):
+    # One JSON value per non-empty line, either a list of elements or an
+    # object with the elements under elementsKey and an optional id under
+    # idKey. Sequences without ids are numbered from 0.
+    count = 0
+    for line in _lines(source):
+        if not line.strip():
+            continue
+        value = json.loads(line)
+        if isinstance(value, dict):
+            elements = value[elementsKey]
+            id = value.get(idKey, count)
+        else:
+            elements = value
+            id = count
+        yield Sequence([elementFromJson(e) for e in elements], id=id)
+        count += 1
+
+
+def readFasta(source, tokenize=list):
+    # Records start with a '>' header whose first word is the id. The
+    # elements of a record are the tokens of its lines, one character each
+    # by default; pass str.split for whitespace-separated tokens. Lines
+    # starting with ';' are comments.
+    id = None
+    elements = None
+    for line in _lines(source):
+        line = line.rstrip('\r\n')
+        if line.startswith('>'):
+            if elements is not None:
+                yield Sequence(elements, id=id)
+            words = line[1:].split()
+            id = words[0] if words else None
+            elements = list()
+        elif line.startswith(';') or not line.strip():
+            continue
+        else:
+            if elements is None:
+                elements = list()
+            elements.extend(tokenize(line.strip()))
+    if elements is not None:
+        yield Sequence(elements, id=id)
+
+
+def readSequences(path, format=None):
+    # Reads a file by its format, 'jsonl', 'fasta' or 'tokens'. The format
+    # is guessed from the extension when not given.
+    if format is None:
+        extension = os.path.splitext(path)[1].lower()
+        if extension in JSON_EXTENSIONS:
+            format = 'jsonl'
+        elif extension in FASTA_EXTENSIONS:
+            format = 'fasta'
+        else:
+            format = 'tokens'
+    if format not in READERS:
+        raise ValueError('unknown sequence format %r' % format)
+    return READERS[format](path)
+
+
+READERS = {
+    'jsonl': readJsonLines,
+    'fasta': readFasta,
+    'tokens': readTokens,
+}
+
+
+def _lines(source):
+    if isinstance(source, string_types):
+        with io.open(source, encoding='utf-8') as f:
+            for line in f:
+                yield line
+    else:
+        for line in source:
+            yield line
+
+
+# Encoding --------------------------------------------------------------------
+
+def chunked(iterable, chunkSize=DEFAULT_CHUNK_SIZE):
+    # Lists of up to chunkSize consecutive items.
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunkSize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def encodeChunks(vocabulary, sequences, chunkSize=DEFAULT_CHUNK_SIZE):
+    # Pairs of lists of sequences and their encodings, chunk by chunk. The
+    # vocabulary grows with the elements seen so far.
+    for chunk in chunked(sequences, chunkSize):
+        yield chunk, vocabulary.encodeMany(chunk)
+
+
+def decodeResult(vocabulary, result, backtrace=True):
+    if not backtrace:
+        return result
+    score, alignments = result
+    return score, [vocabulary.decodeSequenceAlignment(a) for a in alignments]
+
+
+# Pipelines -------------------------------------------------------------------
+
+# Pipelines read their input lazily and keep at most a few chunks per worker
+# in memory, so memory does not grow with the size of the corpus, apart from
+# the vocabulary. Results come in input order. With backtrace, a result is a
+# score and the decoded alignments; otherwise it is the score alone.
+
+def alignStream(aligner, vocabulary, reference, sequences,
+                chunkSize=DEFAULT_CHUNK_SIZE, workers=None, backtrace=True):
+    # Aligns the reference with every sequence and yields (sequence, result)
+    # pairs.
+    if not isinstance(reference, EncodedSequence):
+        reference = vocabulary.encodeSequence(reference)
+    work = ((chunk, None, encodeds) for chunk, encodeds
+            in encodeChunks(vocabulary, sequences, chunkSize))
+    for sequence, result in _alignChunks(aligner, reference, work, workers,
+                                         backtrace):
+        yield sequence, decodeResult(vocabulary, result, backtrace)
+
+
+def alignWindow(aligner, vocabulary, sequences, window=1,
+                chunkSize=DEFAULT_CHUNK_SIZE, workers=None, backtrace=True):
+    # Aligns every sequence with each of the `window` sequences before it and
+    # yields (previous, sequence, result) triples.
+    if window < 1:
+        raise ValueError('window must be positive, got %d' % window)
+    for (previous, sequence), result in _alignChunks(
+            aligner, None, _windowPairs(vocabulary, sequences, window,
+                                        chunkSize),
+            workers, backtrace):
+        yield previous, sequence, decodeResult(vocabulary, result, backtrace)
+
+
+def _windowPairs(vocabulary, sequences, window, chunkSize):
+    recent = collections.deque(maxlen=window)
+    items = list()
+    firsts = list()
+    seconds = list()
+    for chunk, encodeds in encodeChunks(vocabulary, sequences, chunkSize):
+        for sequence, encoded in zip(chunk, encodeds):
+            for previous, previousEncoded in recent:
+                items.append((previous, sequence))
+                firsts.append(previousEncoded)
+                seconds.append(encoded)
+            recent.append((sequence, encoded))
+            if len(items) >= chunkSize:
+                yield items, firsts, seconds
+                items, firsts, seconds = list(), list(), list()
+    if items:
+        yield items, firsts, seconds
+
+
+def _alignChunks(aligner, query, work, workers, backtrace):
+    # Yields (item, result) for chunks of (items, firsts, seconds). The
+    # firsts are None when the sequences are aligned with the query.
+    if not workers or workers <= 1:
+        for items, firsts, seconds in work:
+            if firsts is None:
+                firsts = itertools.repeat(query)
+            for item, first, second in zip(items, firsts, seconds):
+                yield item, aligner.align(first, second, backtrace)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    pending = collections.deque()
+    with ProcessPoolExecutor(workers, initializer=batch.initWorker,
+                             initargs=(aligner, query)) as executor:
+        try:
+            for items, firsts, seconds in work:
+                if firsts is None:
+                    codes, offsets, ids = batch.pack(seconds)
+                    future = executor.submit(batch.alignPacked, codes,
+                                             offsets, ids, backtrace)
+                else:
+                    future = executor.submit(
+                        batch.alignPackedPairs, batch.pack(firsts),
+                        batch.pack(seconds), backtrace)
+                pending.append((items, future))
+                # Keep every worker busy, but no further ahead.
+                if len(pending) > 2 * workers:
+                    items, future = pending.popleft()
+                    for item, result in zip(items, future.result()):
+                        yield item, result
+            while pending:
+                items, future = pending.popleft()
+                for item, result in zip(items, future.result()):
+                    yield item, result
+        finally:
+            for _, future in pending:
+                future.cancel()
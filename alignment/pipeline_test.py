@@ -0,0 +1,106 @@
+import io
+import itertools
+
+import pytest
+
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .pipeline import alignStream
+from .pipeline import alignWindow
+from .pipeline import readFasta
+from .pipeline import readJsonLines
+from .pipeline import readSequences
+from .pipeline import readTokens
+from .testing import ALIGNER
+from .testing import CORPUS
+
+
+LINES = [line for line in CORPUS if line]
+
+
+def _expected(vocabulary, first, second):
+    score, alignments = ALIGNER.align(vocabulary.encodeSequence(first),
+                                      vocabulary.encodeSequence(second), True)
+    return score, [vocabulary.decodeSequenceAlignment(a).key()
+                   for a in alignments]
+
+
+def _keys(result):
+    score, alignments = result
+    return score, [a.key() for a in alignments]
+
+
+def test_read_tokens():
+    sequences = list(readTokens(io.StringIO(u'a b\n\n c  d \nx,y\n')))
+    assert [(list(s), s.id) for s in sequences] == \
+        [(['a', 'b'], 0), (['c', 'd'], 1), (['x,y'], 2)]
+    sequences = readTokens(io.StringIO(u'x,y\n'), separator=',')
+    assert [list(s) for s in sequences] == [['x', 'y']]
+
+
+def test_read_json_lines():
+    text = u'["a", "b"]\n\n{"id": "s", "elements": ["c", [1, 2]]}\n'
+    sequences = list(readJsonLines(io.StringIO(text)))
+    assert [(list(s), s.id) for s in sequences] == \
+        [(['a', 'b'], 0), (['c', (1, 2)], 's')]
+
+
+def test_read_fasta():
+    text = u';comment\n>one first\nACG\nT\n\n>two\nGG\n>\n'
+    sequences = list(readFasta(io.StringIO(text)))
+    assert [(''.join(s), s.id) for s in sequences] == \
+        [('ACGT', 'one'), ('GG', 'two'), ('', None)]
+    sequences = readFasta(io.StringIO(u'>w\nthe cat\nsat\n'), str.split)
+    assert [list(s) for s in sequences] == [['the', 'cat', 'sat']]
+
+
+def test_read_sequences(tmp_path):
+    path = tmp_path / 'sequences.fasta'
+    path.write_text(u'>a\nAC\n')
+    assert [list(s) for s in readSequences(str(path))] == [['A', 'C']]
+    path = tmp_path / 'sequences.txt'
+    path.write_text(u'A C\n')
+    assert [list(s) for s in readSequences(str(path))] == [['A', 'C']]
+    with pytest.raises(ValueError):
+        readSequences(str(path), 'xml')
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_align_stream(workers):
+    vocabulary = Vocabulary()
+    reference = Sequence('a b c d'.split())
+    sequences = readTokens(io.StringIO(u'\n'.join(LINES)))
+    results = list(alignStream(ALIGNER, vocabulary, reference, sequences,
+                               chunkSize=2, workers=workers))
+    assert [list(s) for s, _ in results] == [l.split() for l in LINES]
+    assert [_keys(r) for _, r in results] == \
+        [_expected(vocabulary, reference, s) for s, _ in results]
+
+    scores = alignStream(ALIGNER, vocabulary, reference,
+                         readTokens(io.StringIO(u'\n'.join(LINES))),
+                         workers=workers, backtrace=False)
+    assert [score for _, score in scores] == [r[0] for _, r in results]
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_align_window(workers):
+    vocabulary = Vocabulary()
+    sequences = [Sequence(l.split(), id=k) for k, l in enumerate(LINES)]
+    results = list(alignWindow(ALIGNER, vocabulary, iter(sequences),
+                               window=2, chunkSize=3, workers=workers))
+    assert [(a.id, b.id) for a, b, _ in results] == \
+        [(0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 4), (3, 4)]
+    assert [_keys(r) for _, _, r in results] == \
+        [_expected(vocabulary, a, b) for a, b, _ in results]
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_pipelines_are_lazy(workers):
+    sequences = (Sequence(LINES[k % len(LINES)].split(), id=k)
+                 for k in itertools.count())
+    results = alignStream(ALIGNER, Vocabulary(), Sequence(['a', 'b']),
+                          sequences, chunkSize=4, workers=workers,
+                          backtrace=False)
+    head = list(itertools.islice(results, 10))
+    results.close()
+    assert [s.id for s, _ in head] == list(range(10))
@@ -3,14 +3,22 @@ from six import itervalues
 from six import text_type
 from six.moves import builtins
 
+import functools
 import operator
 
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .sequence import BaseSequence
 from .sequence import Sequence
 
 
 # Profile ---------------------------------------------------------------------
 
 class SoftElement(object):
+    __slots__ = ('__weights',)
 
     def __init__(self, weights):
         self.__weights = dict(weights)
@@ -95,14 +103,14 @@ class Profile(Sequence):
             profile.push(element)
         return profile
 
-    def __init__(self, elements=None):
+    def __init__(self, elements=None, id=None):
         if elements is None:
-            super(Profile, self).__init__(list())
+            super(Profile, self).__init__(list(), id)
         else:
             if not all(isinstance(e, SoftElement) for e in elements):
                 raise ValueError(
                     'profile elements must belong to SoftElement class')
-            super(Profile, self).__init__(list(elements))
+            super(Profile, self).__init__(list(elements), id)
 
     def key(self):
         return tuple(e.key() for e in self.elements)
@@ -120,10 +128,8 @@ class Profile(Sequence):
         return max(len(e) for e in self.elements)
 
     def maxVariationCount(self):
-        # Silence code inspection warning. `builtins.reduce` should hopefully
-        # work both in Python 2 and Python 3.
-        # noinspection PyCompatibility,PyUnresolvedReferences
-        return builtins.reduce(operator.mul, (len(e) for e in self.elements))
+        return functools.reduce(operator.mul,
+                                (len(e) for e in self.elements))
 
     def mergeWith(self, other):
         if len(self) != len(other):
@@ -132,6 +138,9 @@ class Profile(Sequence):
         self.elements = [a.mergedWith(b)
                          for a, b in builtins.zip(self.elements, other.elements)]
 
+    def probabilityMatrix(self, columns=None):
+        return probabilityMatrix(self.elements, columns)
+
     def toDict(self):
         return [e.toDict() for e in self.elements]
 
@@ -139,3 +148,220 @@ class Profile(Sequence):
     def fromDict(cls, d):
         elements = [SoftElement.fromDict(e) for e in d]
         return cls(elements)
+
+
+class CompactProfile(BaseSequence):
+    # A profile stored like a CSR sparse matrix: the elements of soft
+    # element i are codes[offsets[i]:offsets[i + 1]], sorted, with the
+    # corresponding weights. Soft elements are only created when accessed,
+    # and merging and counting work on the arrays directly.
+
+    def __init__(self, codes, weights, offsets, id=None):
+        super(CompactProfile, self).__init__(None, id)
+        self.codes = numpy.asarray(codes)
+        self.weights = numpy.asarray(weights)
+        self.offsets = numpy.asarray(offsets, int)
+
+    @classmethod
+    def fromSequence(cls, sequence):
+        codes = sequence.asArray()
+        n = len(codes)
+        return cls(codes, numpy.ones(n, int), numpy.arange(n + 1),
+                   id=sequence.id)
+
+    @classmethod
+    def fromSequenceAlignment(cls, alignment):
+        a = alignment.first.asArray()
+        b = alignment.second.asArray()
+        same = a == b
+        # An identical pair has one element with weight 2, other pairs have
+        # two elements with weight 1.
+        codes = numpy.stack([a, b], axis=1)
+        weights = numpy.where(same, 2, 1)
+        keep = numpy.stack([numpy.ones(len(a), bool), ~same], axis=1)
+        codes = codes[keep]
+        weights = numpy.stack([weights, weights], axis=1)[keep]
+        offsets = numpy.zeros(len(a) + 1, int)
+        numpy.cumsum(numpy.where(same, 1, 2), out=offsets[1:])
+        return cls(*_canonical(codes, weights, _rowsOf(offsets), len(a)))
+
+    @classmethod
+    def fromAlignedRows(cls, rows, id=None):
+        # The profile of the columns of a (sequences x columns) code matrix,
+        # such as the rows of a multiple alignment.
+        rows = numpy.asarray(rows)
+        count, length = rows.shape
+        columns = numpy.repeat(numpy.arange(length), count)
+        return cls(*_canonical(rows.T.ravel(), numpy.ones(rows.size, int),
+                               columns, length), id=id)
+
+    @classmethod
+    def fromProfile(cls, profile):
+        return cls.fromDict(profile.toDict(), id=profile.id)
+
+    @classmethod
+    def fromDict(cls, d, id=None):
+        codes = [e for weights in d for e in weights]
+        weights = [w for weights in d for w in itervalues(weights)]
+        offsets = numpy.zeros(len(d) + 1, int)
+        numpy.cumsum([len(weights) for weights in d], out=offsets[1:])
+        return cls(*_canonical(numpy.array(codes), numpy.array(weights),
+                               _rowsOf(offsets), len(d)), id=id)
+
+    def toDict(self):
+        return [e.toDict() for e in self]
+
+    def toProfile(self):
+        return Profile(list(self), id=self.id)
+
+    def variationCounts(self):
+        return numpy.diff(self.offsets)
+
+    def minVariationCount(self):
+        # Same as Profile.minVariationCount.
+        return int(self.variationCounts().max())
+
+    def maxVariationCount(self):
+        return functools.reduce(operator.mul,
+                                self.variationCounts().tolist(), 1)
+
+    def key(self):
+        single = self.variationCounts() == 1
+        codes = self.codes[self.offsets[:-1][single]].tolist()
+        key = [None] * len(self)
+        for i, code in zip(numpy.flatnonzero(single).tolist(), codes):
+            key[i] = code
+        return tuple(key)
+
+    def mergedWith(self, other):
+        if len(self) != len(other):
+            raise ValueError(
+                'profiles with different lengths cannot be merged')
+        codes = numpy.concatenate([self.codes, other.codes])
+        weights = numpy.concatenate([self.weights, other.weights])
+        rows = numpy.concatenate([_rowsOf(self.offsets),
+                                  _rowsOf(other.offsets)])
+        return CompactProfile(*_canonical(codes, weights, rows, len(self)),
+                              id=self.id)
+
+    def mergeWith(self, other):
+        merged = self.mergedWith(other)
+        self.codes = merged.codes
+        self.weights = merged.weights
+        self.offsets = merged.offsets
+
+    def probabilityMatrix(self, columns=None):
+        rows = _rowsOf(self.offsets)
+        totals = numpy.zeros(len(self))
+        numpy.add.at(totals, rows, self.weights)
+        probabilities = self.weights / totals[rows]
+        if columns is None:
+            size = int(self.codes.max()) + 1 if len(self.codes) else 0
+            indices = self.codes
+        else:
+            size = len(columns)
+            indices = numpy.array([columns[e] for e in self.codes.tolist()],
+                                  int)
+        matrix = numpy.zeros((len(self), size))
+        matrix[rows, indices] = probabilities
+        return matrix
+
+    def reversed(self):
+        counts = self.variationCounts()[::-1]
+        offsets = numpy.zeros(len(self) + 1, int)
+        numpy.cumsum(counts, out=offsets[1:])
+        order = numpy.concatenate([
+            numpy.arange(self.offsets[i], self.offsets[i + 1])
+            for i in range(len(self) - 1, -1, -1)] or [numpy.zeros(0, int)])
+        return CompactProfile(self.codes[order], self.weights[order],
+                              offsets, id=self.id)
+
+    def __eq__(self, other):
+        if self.id is None or other.id is None:
+            return self.toDict() == other.toDict()
+        else:
+            return self.id == other.id
+
+    def __hash__(self):
+        return super(CompactProfile, self).__hash__()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        start = self.offsets[item]
+        stop = self.offsets[item + 1]
+        return SoftElement(zip(self.codes[start:stop].tolist(),
+                               self.weights[start:stop].tolist()))
+
+    def __setitem__(self, key, value):
+        raise TypeError('compact profiles are immutable, use toProfile()')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __str__(self):
+        if self.id is None:
+            result = ''
+        else:
+            result = '> %s\n' % self.id
+        result += ' '.join(str(e) for e in self)
+        return result
+
+    def __unicode__(self):
+        if self.id is None:
+            result = u''
+        else:
+            result = u'> %s\n' % self.id
+        result += u' '.join(text_type(e) for e in self)
+        return result
+
+
+def _rowsOf(offsets):
+    # The soft element index of every entry.
+    return numpy.repeat(numpy.arange(len(offsets) - 1), numpy.diff(offsets))
+
+
+def _canonical(codes, weights, rows, length):
+    # Sort entries by soft element and code, and add up the weights of
+    # duplicate codes within a soft element.
+    order = numpy.lexsort((codes, rows))
+    codes = codes[order]
+    weights = weights[order]
+    rows = rows[order]
+    if len(codes):
+        first = numpy.ones(len(codes), bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (codes[1:] != codes[:-1])
+        starts = numpy.flatnonzero(first)
+        weights = numpy.add.reduceat(weights, starts)
+        codes = codes[starts]
+        rows = rows[starts]
+    offsets = numpy.zeros(length + 1, int)
+    numpy.cumsum(numpy.bincount(rows, minlength=length), out=offsets[1:])
+    return codes, weights, offsets
+
+
+def probabilityMatrix(softElements, columns=None):
+    # Row i holds the probabilities of the i-th soft element, with the
+    # probability of element e in column columns[e]. Without `columns`,
+    # elements must be vocabulary codes, and code c goes to column c.
+    softElements = list(softElements)
+    if columns is None:
+        size = max([max(e) + 1 for e in softElements if len(e)] or [0])
+        matrix = numpy.zeros((len(softElements), size))
+        for i, softElement in enumerate(softElements):
+            for e, p in iteritems(softElement.probabilities()):
+                matrix[i, e] = p
+    else:
+        matrix = numpy.zeros((len(softElements), len(columns)))
+        for i, softElement in enumerate(softElements):
+            for e, p in iteritems(softElement.probabilities()):
+                matrix[i, columns[e]] = p
+    return matrix
@@ -0,0 +1,70 @@
+import random
+
+import numpy
+import pytest
+
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .sequencealigner import SimpleScoring
+from .sequencealigner import GlobalSequenceAligner
+from .profile import CompactProfile
+from .profile import Profile
+from .profilealigner import SoftScoring
+from .profilealigner import GlobalProfileAligner
+
+
+def _randomAlignments(count, seed=0):
+    rng = random.Random(seed)
+    vocab = Vocabulary()
+    aligner = GlobalSequenceAligner(SimpleScoring(2, -1), -2)
+    for _ in range(count):
+        a = Sequence(rng.choice('abcd') for _ in range(rng.randint(1, 10)))
+        b = Sequence(rng.choice('abcd') for _ in range(rng.randint(1, 10)))
+        _, alignments = aligner.align(vocab.encodeSequence(a),
+                                      vocab.encodeSequence(b),
+                                      backtrace=True)
+        yield alignments[0]
+
+
+def test_round_trip():
+    for alignment in _randomAlignments(20):
+        profile = Profile.fromSequenceAlignment(alignment)
+        compact = CompactProfile.fromSequenceAlignment(alignment)
+        assert compact.toDict() == profile.toDict()
+        assert CompactProfile.fromDict(profile.toDict()) == compact
+        assert CompactProfile.fromProfile(profile).toProfile() == profile
+        assert list(compact) == list(profile)
+        assert compact.key() == profile.key()
+
+
+def test_merge_and_counts():
+    alignments = list(_randomAlignments(200, seed=1))
+    for first, second in zip(alignments[::2], alignments[1::2]):
+        if len(first) != len(second):
+            continue
+        profile = Profile.fromSequenceAlignment(first)
+        profile.mergeWith(Profile.fromSequenceAlignment(second))
+        compact = CompactProfile.fromSequenceAlignment(first)
+        compact.mergeWith(CompactProfile.fromSequenceAlignment(second))
+        assert compact.toDict() == profile.toDict()
+        assert compact.minVariationCount() == profile.minVariationCount()
+        assert compact.maxVariationCount() == profile.maxVariationCount()
+        assert numpy.allclose(compact.probabilityMatrix(),
+                              profile.probabilityMatrix())
+        assert compact.reversed() == profile.reversed()
+    with pytest.raises(ValueError):
+        compact.mergeWith(CompactProfile.fromDict([{1: 1}] * 20))
+
+
+def test_compact_profile_alignment():
+    vocab = Vocabulary()
+    a = vocab.encodeSequence(Sequence('what a beautiful day'.split()))
+    b = vocab.encodeSequence(Sequence('what a bad day'.split()))
+    aligner = GlobalProfileAligner(SoftScoring(SimpleScoring(2, -1)), -2)
+    first = CompactProfile.fromSequence(a)
+    second = CompactProfile.fromSequence(b)
+    score, alignments = aligner.align(first, second, backtrace=True)
+    assert score == aligner.align(Profile.fromSequence(a),
+                                  Profile.fromSequence(b)) == 5
+    assert str(vocab.decodeProfile(alignments[0].second)) == \
+        'what a bad day'
@@ -1,10 +1,18 @@
 from six import iteritems
 
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+import numbers
 from abc import ABCMeta
 
 from .sequence import GAP_CODE
 from .profile import SoftElement
+from .profile import CompactProfile
 from .profile import Profile
+from .profile import probabilityMatrix
+from .sequencealigner import CompactAlignmentBuilder
 from .sequencealigner import Scoring
 from .sequencealigner import SequenceAlignment
 from .sequencealigner import SequenceAligner
@@ -15,17 +23,89 @@ from .sequencealigner import LocalSequenceAligner
 
 # Scoring ---------------------------------------------------------------------
 
+# Soft scores are rounded to this many decimals. Sums of the same products in
+# a different order can differ in the last bit, which the alignment matrices
+# would turn into a difference of one when they truncate cells to integers.
+SCORE_DIGITS = 9
+
+
 class SoftScoring(Scoring):
 
     def __init__(self, scoring):
         self.scoring = scoring
 
+    def key(self):
+        return type(self).__name__, self.scoring.key()
+
+    def hasContentKey(self):
+        return self.scoring.hasContentKey()
+
+    def isSymmetric(self):
+        return self.scoring.isSymmetric()
+
     def __call__(self, firstElement, secondElement):
         score = 0.0
         for a, p in iteritems(firstElement.probabilities()):
             for b, q in iteritems(secondElement.probabilities()):
                 score += p * q * self.scoring(a, b)
-        return score
+        return float(numpy.round(score, SCORE_DIGITS))
+
+    # Both vectorized methods below score soft elements through their
+    # probability matrices P and Q and the substitution matrix S of the
+    # elements they contain: all cells at once as P S Q^T, or the given
+    # pairs as the row sums of (P S) * Q. They are rounded like __call__, so
+    # that all three agree.
+
+    def scoreMatrix(self, first, second):
+        if isinstance(first, CompactProfile) \
+                and isinstance(second, CompactProfile):
+            # Array-backed profiles list their elements without creating
+            # soft elements.
+            elements = numpy.union1d(first.codes, second.codes)
+            columns = dict((e, k) for k, e in enumerate(elements.tolist()))
+            substitutions = self.substitutions(elements)
+            return numpy.round(
+                first.probabilityMatrix(columns).dot(substitutions).dot(
+                    second.probabilityMatrix(columns).T), SCORE_DIGITS)
+        a = first.asArray()
+        b = second.asArray()
+        columns, substitutions = self.substitutionMatrix(a, b)
+        p = probabilityMatrix(a, columns)
+        q = probabilityMatrix(b, columns)
+        return numpy.round(p.dot(substitutions).dot(q.T), SCORE_DIGITS)
+
+    def scorePairs(self, firstElements, secondElements):
+        columns, substitutions = self.substitutionMatrix(firstElements,
+                                                         secondElements)
+        p = probabilityMatrix(firstElements, columns)
+        q = probabilityMatrix(secondElements, columns)
+        return numpy.round((p.dot(substitutions) * q).sum(axis=1),
+                           SCORE_DIGITS)
+
+    def substitutionMatrix(self, firstElements, secondElements):
+        # Column indices of the elements in the given soft elements and the
+        # scores of all pairs of them.
+        columns = dict()
+        for softElements in (firstElements, secondElements):
+            for softElement in softElements:
+                for e in softElement:
+                    if e not in columns:
+                        columns[e] = len(columns)
+        k = len(columns)
+        if all(isinstance(e, numbers.Integral) for e in columns):
+            elements = numpy.zeros(k, int)
+        else:
+            elements = numpy.empty(k, object)
+        for e, column in iteritems(columns):
+            elements[column] = e
+        return columns, self.substitutions(elements)
+
+    def substitutions(self, elements):
+        # Scores of all pairs of the given elements as a float matrix.
+        k = len(elements)
+        scores = self.scoring.scorePairs(numpy.repeat(elements, k),
+                                         numpy.tile(elements, k))
+        return numpy.asarray(scores, float).reshape(k, k)
 
 
 # Alignment -------------------------------------------------------------------
@@ -49,6 +129,23 @@ class ProfileAligner(SequenceAligner):
     def emptyAlignment(self, first, second):
         return ProfileAlignment(Profile(), Profile())
 
+    def emptyCompactAlignment(self, first, second):
+        return CompactAlignmentBuilder(first, second,
+                                       SoftElement({GAP_CODE: 1}))
+
+    def computeAlignmentScore(self, first, second):
+        # The score grid of two profiles is a single matrix product, which
+        # is much cheaper than scoring them one anti-diagonal at a time.
+        return self.bestScore(self.computeAlignmentMatrix(first, second))
+
+    def alignLinearSpace(self, first, second):
+        # Hirschberg's algorithm adds up the best scores of both halves,
+        # which only agrees with the alignment matrices, whose cells are
+        # truncated to integers, when all scores are integers. Soft scores
+        # are fractional.
+        raise NotImplementedError('%s does not support linear space '
+                                  'alignment' % type(self).__name__)
+
 
 class GlobalProfileAligner(ProfileAligner, GlobalSequenceAligner):
     pass
@@ -0,0 +1,120 @@
+import random
+
+import numpy
+import pytest
+
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .profile import Profile
+from .profile import CompactProfile
+from .profile import SoftElement
+from .sequencealigner import SimpleScoring
+from .sequencealigner import MatrixScoring
+from .sequencealigner import Scoring
+from .sequencealigner import CompactSequenceAlignment
+from .profilealigner import SoftScoring
+from .profilealigner import GlobalProfileAligner
+from .profilealigner import StrictGlobalProfileAligner
+from .profilealigner import LocalProfileAligner
+
+
+FIRST = Profile([SoftElement({1: 2}), SoftElement({1: 1, 2: 3}),
+                 SoftElement({3: 1})])
+SECOND = Profile([SoftElement({2: 1, 3: 1}), SoftElement({1: 4}),
+                  SoftElement({4: 1, 1: 1, 2: 2}), SoftElement({3: 5})])
+
+
+def test_probability_matrix():
+    p = FIRST.probabilityMatrix()
+    assert p.shape == (3, 4)
+    assert numpy.allclose(p, [[0, 1, 0, 0], [0, 0.25, 0.75, 0],
+                              [0, 0, 0, 1]])
+    p = SECOND.probabilityMatrix({4: 0, 3: 1, 2: 2, 1: 3})
+    assert numpy.allclose(p[2], [0.25, 0, 0.5, 0.25])
+
+
+def test_score_matrix_matches_cells():
+    for scoring in (SimpleScoring(2, -1),
+                    MatrixScoring(numpy.arange(25).reshape(5, 5) % 7 - 3)):
+        softScoring = SoftScoring(scoring)
+        expected = [[softScoring(a, b) for b in SECOND] for a in FIRST]
+        assert numpy.allclose(softScoring.scoreMatrix(FIRST, SECOND),
+                              expected)
+        assert numpy.allclose(
+            softScoring.scorePairs(FIRST.asArray(), SECOND.asArray()[:3]),
+            [expected[i][i] for i in range(3)])
+
+
+class CellwiseSoftScoring(SoftScoring):
+    # Scores every cell with __call__.
+    scoreMatrix = Scoring.scoreMatrix
+    scorePairs = Scoring.scorePairs
+
+
+def test_aligned_scores_match_cells():
+    # Products in a different order differ in the last bit, which must not
+    # change the truncated cells.
+    rng = random.Random(0)
+
+    def randomProfile():
+        return Profile([SoftElement(dict(
+            (code, rng.choice([1, 2, 3]))
+            for code in rng.sample(range(1, 5), rng.randint(1, 3))))
+            for _ in range(rng.randint(1, 8))])
+
+    for _ in range(100):
+        first = randomProfile()
+        second = randomProfile()
+        scoring = SimpleScoring(rng.choice([1, 2, 3]), rng.choice([-1, -2]))
+        for aligner in (StrictGlobalProfileAligner, GlobalProfileAligner,
+                        LocalProfileAligner):
+            assert aligner(SoftScoring(scoring), -1).align(first, second) \
+                == aligner(CellwiseSoftScoring(scoring), -1).align(first,
+                                                                   second)
+
+
+def test_linear_space_is_not_supported():
+    for aligner in (GlobalProfileAligner, StrictGlobalProfileAligner):
+        aligner = aligner(SoftScoring(SimpleScoring(2, -1)), -2)
+        with pytest.raises(NotImplementedError):
+            aligner.alignLinearSpace(FIRST, SECOND)
+
+
+def test_profile_alignment():
+    vocab = Vocabulary()
+    a = vocab.encodeSequence(Sequence('what a beautiful day'.split()))
+    b = vocab.encodeSequence(Sequence('what a bad day'.split()))
+    aligner = GlobalProfileAligner(SoftScoring(SimpleScoring(2, -1)), -2)
+    first = Profile.fromSequence(a)
+    second = Profile.fromSequence(b)
+    score, alignments = aligner.align(first, second, backtrace=True)
+    assert score == aligner.align(first, second) == 5
+    assert len(alignments) == 1
+    assert str(vocab.decodeProfile(alignments[0].first)) == \
+        'what a beautiful day'
+    assert str(vocab.decodeProfile(alignments[0].second)) == \
+        'what a bad day'
+
+
+def test_compact_profile_alignment():
+    vocab = Vocabulary()
+    a = vocab.encodeSequence(Sequence('what a beautiful sunny day'.split()))
+    b = vocab.encodeSequence(Sequence('what a bad day'.split()))
+    first = Profile.fromSequence(a)
+    second = Profile.fromSequence(b)
+    for aligner in (GlobalProfileAligner, LocalProfileAligner):
+        aligner = aligner(SoftScoring(SimpleScoring(2, -1)), -2)
+        score, expected = aligner.align(first, second, backtrace=True)
+        compactScore, actual = aligner.align(
+            CompactProfile.fromProfile(first),
+            CompactProfile.fromProfile(second), backtrace=True, compact=True)
+        assert compactScore == score
+        assert len(actual) == len(expected)
+        for x, y in zip(actual, expected):
+            assert isinstance(x, CompactSequenceAlignment)
+            assert x.key() == y.key()
+            assert str(x) == str(y)
+            assert str(vocab.decodeProfile(x.first)) == \
+                str(vocab.decodeProfile(y.first))
+            assert str(vocab.decodeProfile(x.second)) == \
+                str(vocab.decodeProfile(y.second))
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+
+# Seconds to wait for other processes to release the database.
+DEFAULT_TIMEOUT = 60.0
+
+# SQLite limits the number of parameters of one statement.
+BATCH_SIZE = 500
+
+
+# Keys ------------------------------------------------------------------------
+
+# Keys are SHA-1 digests and stay the same across processes and runs. They
+# combine the configuration of the aligner with the codes of both
+# sequences, so code arrays of any integer type give the same keys.
+
+def configDigest(aligner):
+    if not aligner.scoring.hasContentKey():
+        raise ValueError('%s has no content key and cannot be stored'
+                         % type(aligner.scoring).__name__)
+    return hashlib.sha1(repr(aligner.key()).encode('utf-8')).digest()
+
+
+def sequenceDigest(sequence):
+    codes = numpy.ascontiguousarray(sequence.asArray(), '<i8')
+    return hashlib.sha1(codes).digest()
+
+
+def pairKey(config, firstDigest, secondDigest, symmetric=False):
+    if symmetric and secondDigest < firstDigest:
+        firstDigest, secondDigest = secondDigest, firstDigest
+    return hashlib.sha1(config + firstDigest + secondDigest).digest()
+
+
+# Store -----------------------------------------------------------------------
+
+class ScoreStore(object):
+    # Alignment scores by pair key in an SQLite database in WAL mode, so
+    # that any number of processes can read while one of them writes. Each
+    # process opens its own connection; stores are pickled by path. The
+    # store remembers when every entry was last used and `compact` keeps
+    # the most recently used ones.
+
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.__connection = None
+        self.__pid = None
+
+    def connection(self):
+        if self.__connection is None or self.__pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS scores '
+                               '(key BLOB PRIMARY KEY, score, used REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS scores_used '
+                               'ON scores (used)')
+            self.__connection = connection
+            self.__pid = os.getpid()
+        return self.__connection
+
+    def keys(self, aligner, pairs):
+        # Keys of (first, second) sequence pairs aligned by `aligner`.
+        config = configDigest(aligner)
+        symmetric = aligner.isSymmetric()
+        digests = dict()
+        keys = list()
+        for first, second in pairs:
+            for sequence in (first, second):
+                if id(sequence) not in digests:
+                    digests[id(sequence)] = sequenceDigest(sequence)
+            keys.append(pairKey(config, digests[id(first)],
+                                digests[id(second)], symmetric))
+        return keys
+
+    def getMany(self, keys):
+        # Scores of the stored keys as a dict.
+        connection = self.connection()
+        keys = list(keys)
+        found = dict()
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            marks = ','.join('?' * len(batch))
+            rows = connection.execute(
+                'SELECT key, score FROM scores WHERE key IN (%s)' % marks,
+                batch).fetchall()
+            found.update((bytes(key), score) for key, score in rows)
+        if found:
+            now = time.time()
+            with connection:
+                connection.executemany(
+                    'UPDATE scores SET used = ? WHERE key = ?',
+                    [(now, key) for key in found])
+        return found
+
+    def putMany(self, items):
+        now = time.time()
+        connection = self.connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO scores VALUES (?, ?, ?)',
+                [(key, _plain(score), now) for key, score in items])
+
+    def get(self, key, default=None):
+        return self.getMany([key]).get(key, default)
+
+    def put(self, key, score):
+        self.putMany([(key, score)])
+
+    def compact(self, maxEntries):
+        # Keep the maxEntries most recently used scores and give the space
+        # of the others back to the file system.
+        connection = self.connection()
+        with connection:
+            connection.execute(
+                'DELETE FROM scores WHERE key NOT IN (SELECT key FROM scores '
+                'ORDER BY used DESC LIMIT ?)', (maxEntries,))
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        connection.execute('VACUUM')
+
+    def close(self):
+        if self.__connection is not None and self.__pid == os.getpid():
+            self.__connection.close()
+        self.__connection = None
+
+    def __len__(self):
+        return self.connection().execute(
+            'SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['timeout'])
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.path)
+
+
+def _plain(score):
+    # NumPy scalars as Python numbers for SQLite.
+    return score.item() if isinstance(score, numpy.generic) else score
+
+
+# Lookups ---------------------------------------------------------------------
+
+def storedScores(aligner, store, pairs, compute):
+    # Scores of the pairs, taken from the store where possible. The others
+    # are computed by compute(indices), which returns their scores, and
+    # added to the store.
+    keys = store.keys(aligner, pairs)
+    found = store.getMany(keys)
+    missing = [k for k, key in enumerate(keys) if key not in found]
+    computed = compute(missing) if missing else list()
+    store.putMany((keys[k], score) for k, score in zip(missing, computed))
+    scores = [found.get(key) for key in keys]
+    for k, score in zip(missing, computed):
+        scores[k] = score
+    return scores
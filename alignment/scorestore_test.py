@@ -0,0 +1,125 @@
+import os
+import pickle
+
+import pytest
+
+from .sequencealigner import Scoring
+from .sequencealigner import SimpleScoring
+from .sequencealigner import LocalSequenceAligner
+from .database import SequenceDatabase
+from .scorestore import ScoreStore
+from .testing import ALIGNER
+from .testing import SEQUENCES
+
+
+class CountingAligner(LocalSequenceAligner):
+
+    def __init__(self):
+        super(CountingAligner, self).__init__(SimpleScoring(3, -1), -2)
+        self.calls = 0
+        self.failing = False
+
+    def align(self, first, second, backtrace=False, compact=False):
+        assert not self.failing, 'unexpected alignment'
+        self.calls += 1
+        return super(CountingAligner, self).align(first, second, backtrace,
+                                                  compact)
+
+
+class RecordingStore(ScoreStore):
+    # Appends the id of every process that looks up scores to a log file.
+
+    def getMany(self, keys):
+        with open(self.path + '.log', 'a') as f:
+            f.write('%d\n' % os.getpid())
+        return super(RecordingStore, self).getMany(keys)
+
+    def lookups(self):
+        with open(self.path + '.log') as f:
+            return [int(line) for line in f]
+
+
+def test_bulk_get_and_put(tmp_path):
+    store = ScoreStore(str(tmp_path / 'scores.db'))
+    keys = store.keys(ALIGNER, [(SEQUENCES[0], SEQUENCES[1]),
+                                (SEQUENCES[1], SEQUENCES[0]),
+                                (SEQUENCES[0], SEQUENCES[3])])
+    # The aligner is symmetric.
+    assert keys[0] == keys[1] != keys[2]
+    store.putMany([(keys[0], 4), (keys[2], 7.5)])
+    assert store.getMany(keys) == {keys[0]: 4, keys[2]: 7.5}
+    assert len(store) == 2
+    # Stores are shared by path.
+    other = pickle.loads(pickle.dumps(store))
+    assert other.get(keys[2]) == 7.5
+    assert other.get(b'missing') is None
+
+
+def test_align_many_reuses_scores(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    query = SEQUENCES[0]
+    expected = [ALIGNER.align(query, t) for t in SEQUENCES]
+    aligner = CountingAligner()
+    assert aligner.alignMany(query, SEQUENCES, store=ScoreStore(path)) == \
+        expected
+    assert aligner.calls == len(SEQUENCES)
+    # A later run only aligns the new pairs.
+    aligner = CountingAligner()
+    targets = SEQUENCES + [SEQUENCES[3].reversed()]
+    assert aligner.alignMany(query, targets, store=ScoreStore(path)) == \
+        expected + [ALIGNER.align(query, targets[-1])]
+    assert aligner.calls == 1
+    assert aligner.alignMany(query, targets, topK=2,
+                             store=ScoreStore(path)) == \
+        ALIGNER.alignMany(query, targets, topK=2)
+
+
+def test_align_many_workers_use_store(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    database = SequenceDatabase.write(str(tmp_path / 'db'), SEQUENCES)
+    query = SEQUENCES[0]
+    expected = [ALIGNER.align(query, t) for t in SEQUENCES]
+    aligner = CountingAligner()
+    assert aligner.alignMany(query, database, workers=2, chunksize=2,
+                             store=ScoreStore(path)) == expected
+    assert len(ScoreStore(path)) == len(SEQUENCES)
+    # The workers find every score in the store themselves.
+    aligner.failing = True
+    store = RecordingStore(path)
+    assert aligner.alignMany(query, database, workers=2, chunksize=2,
+                             store=store) == expected
+    assert store.lookups() and os.getpid() not in store.lookups()
+
+
+def test_pairwise_scores_reuse_scores(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    expected = ALIGNER.pairwiseScores(SEQUENCES).tolist()
+    aligner = CountingAligner()
+    assert aligner.pairwiseScores(SEQUENCES, workers=2, tileSize=2,
+                                  store=ScoreStore(path)).tolist() == expected
+    count = len(SEQUENCES) * (len(SEQUENCES) + 1) // 2
+    assert len(ScoreStore(path)) == count
+    aligner = CountingAligner()
+    assert aligner.pairwiseScores(SEQUENCES, tileSize=4,
+                                  store=ScoreStore(path)).tolist() == expected
+    assert aligner.calls == 0
+
+
+def test_compact(tmp_path):
+    store = ScoreStore(str(tmp_path / 'scores.db'))
+    keys = store.keys(ALIGNER, [(s, s) for s in SEQUENCES])
+    store.putMany((key, k) for k, key in enumerate(keys))
+    store.getMany(keys[:2])
+    store.compact(2)
+    assert sorted(store.getMany(keys).values()) == [0, 1]
+
+
+def test_identity_keyed_scoring(tmp_path):
+    class ConstantScoring(Scoring):
+        def __call__(self, firstElement, secondElement):
+            return 1
+
+    aligner = LocalSequenceAligner(ConstantScoring(), -2)
+    with pytest.raises(ValueError):
+        aligner.alignMany(SEQUENCES[0], SEQUENCES,
+                          store=ScoreStore(str(tmp_path / 'scores.db')))
@@ -0,0 +1,213 @@
+import io
+import json
+import os
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+from .database import SequenceDatabase
+from .database import replaceFile
+from . import banded
+
+
+DEFAULT_SEED_LENGTH = 3
+DEFAULT_BAND = 8
+
+KEYS_FILENAME = 'seedkeys.npy'
+STARTS_FILENAME = 'seedstarts.npy'
+POSITIONS_FILENAME = 'seedpositions.npy'
+SEEDS_FILENAME = 'seeds.json'
+
+# Multiplier of the polynomial k-mer hash. Hashes wrap around at 64 bits;
+# the rare collisions only add candidates, which the extension then scores
+# like any other.
+HASH_MULTIPLIER = numpy.uint64(0x9E3779B97F4A7C15)
+
+
+# Seeds -----------------------------------------------------------------------
+
+def seedHashes(codes, k):
+    # Hashes of all k-mers of a code array, the k-mer at position p first.
+    if len(codes) < k:
+        return numpy.zeros(0, numpy.uint64)
+    windows = numpy.lib.stride_tricks.sliding_window_view(
+        numpy.asarray(codes).astype(numpy.uint64), k)
+    hashes = numpy.zeros(len(windows), numpy.uint64)
+    with numpy.errstate(over='ignore'):
+        for t in range(k):
+            hashes = hashes * HASH_MULTIPLIER + windows[:, t] + 1
+    return hashes
+
+
+# Index -----------------------------------------------------------------------
+
+class SeedIndex(object):
+    # Inverted index from k-mers to their positions in a SequenceDatabase.
+    # The positions of the k-mers with hash keys[s] are
+    # positions[starts[s]:starts[s + 1]], as offsets into database.codes.
+    # K-mers that cross from one sequence into the next are not indexed.
+    #
+    # A search looks up the k-mers of the query, counts the seed hits of
+    # every target on every diagonal and extends the targets with enough
+    # hits on a diagonal by a banded local alignment around those
+    # diagonals. Longer seeds, more required hits and narrower bands are
+    # faster, at the cost of missing weaker similarities.
+
+    def __init__(self, database, k, keys, starts, positions):
+        if len(starts) != len(keys) + 1:
+            raise ValueError('expected %d seed starts for %d seeds, got %d'
+                             % (len(keys) + 1, len(keys), len(starts)))
+        self.database = database
+        self.k = k
+        self.keys = keys
+        self.starts = starts
+        self.positions = positions
+
+    @classmethod
+    def build(cls, sequences, k=DEFAULT_SEED_LENGTH):
+        if k < 1:
+            raise ValueError('seed length must be positive, got %d' % k)
+        if isinstance(sequences, SequenceDatabase):
+            database = sequences
+        else:
+            database = SequenceDatabase.fromSequences(sequences)
+        codes = numpy.asarray(database.codes)
+        offsets = numpy.asarray(database.offsets)
+        hashes = seedHashes(codes, k)
+        positions = numpy.arange(len(hashes))
+        ends = offsets[numpy.searchsorted(offsets, positions, 'right')]
+        positions = positions[positions + k <= ends]
+        hashes = hashes[positions]
+        order = numpy.argsort(hashes, kind='mergesort')
+        hashes = hashes[order]
+        positions = positions[order]
+        keys, starts = numpy.unique(hashes, return_index=True)
+        starts = numpy.append(starts, len(hashes))
+        return cls(database, k, keys, starts, positions)
+
+    @classmethod
+    def write(cls, path, sequences, k=DEFAULT_SEED_LENGTH):
+        cls.build(sequences, k).save(path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        # The sequences are stored next to the seeds, see SequenceDatabase.
+        mode = 'r' if mmap else None
+        database = SequenceDatabase.open(path, mmap)
+        with io.open(os.path.join(path, SEEDS_FILENAME),
+                     encoding='utf-8') as f:
+            k = json.load(f)['k']
+        keys = numpy.load(os.path.join(path, KEYS_FILENAME), mmap_mode=mode)
+        starts = numpy.load(os.path.join(path, STARTS_FILENAME),
+                            mmap_mode=mode)
+        positions = numpy.load(os.path.join(path, POSITIONS_FILENAME),
+                               mmap_mode=mode)
+        return cls(database, k, keys, starts, positions)
+
+    def save(self, path):
+        # Like SequenceDatabase.save, files are replaced atomically, so an
+        # index can be saved over the files it or its database has mapped.
+        self.database.save(path)
+        replaceFile(os.path.join(path, KEYS_FILENAME),
+                    lambda f: numpy.save(f, self.keys))
+        replaceFile(os.path.join(path, STARTS_FILENAME),
+                    lambda f: numpy.save(f, self.starts))
+        replaceFile(os.path.join(path, POSITIONS_FILENAME),
+                    lambda f: numpy.save(f, self.positions))
+        replaceFile(os.path.join(path, SEEDS_FILENAME),
+                    lambda f: f.write(json.dumps(
+                        {'k': self.k}, ensure_ascii=False).encode('utf-8')))
+
+    def hits(self, query, maxSeedOccurrences=None):
+        # Seed hits as arrays of target indices and diagonals j - i, where
+        # i is the position of the k-mer in the query and j in the target.
+        # Seeds occurring more than maxSeedOccurrences times are skipped.
+        hashes = seedHashes(query.asArray(), self.k)
+        slots = numpy.searchsorted(self.keys, hashes)
+        slots[slots == len(self.keys)] = 0
+        found = numpy.flatnonzero(self.keys[slots] == hashes) \
+            if len(self.keys) else numpy.zeros(0, int)
+        starts = self.starts[slots[found]]
+        counts = self.starts[slots[found] + 1] - starts
+        if maxSeedOccurrences is not None:
+            frequent = counts > maxSeedOccurrences
+            found = found[~frequent]
+            starts = starts[~frequent]
+            counts = counts[~frequent]
+        total = int(counts.sum())
+        if total == 0:
+            return numpy.zeros(0, int), numpy.zeros(0, int)
+        # Concatenate the position ranges of all found seeds.
+        first = numpy.cumsum(counts) - counts
+        indices = numpy.arange(total) + numpy.repeat(starts - first, counts)
+        positions = numpy.asarray(self.positions[indices], int)
+        queryPositions = numpy.repeat(found, counts)
+        offsets = numpy.asarray(self.database.offsets)
+        targets = numpy.searchsorted(offsets, positions, 'right') - 1
+        return targets, positions - offsets[targets] - queryPositions
+
+    def candidates(self, query, minSeedHits=1, band=DEFAULT_BAND,
+                   maxSeedOccurrences=None):
+        # Targets with at least minSeedHits hits on one diagonal, as
+        # (target, lo, hi) with the band lo <= j - i <= hi that covers all
+        # such diagonals, widened by `band`.
+        targets, diagonals = self.hits(query, maxSeedOccurrences)
+        if len(targets) == 0:
+            return list()
+        shift = len(query)
+        span = int(numpy.asarray(self.database.lengths()).max()) + shift + 1
+        pairs, counts = numpy.unique(targets * span + diagonals + shift,
+                                     return_counts=True)
+        pairs = pairs[counts >= minSeedHits]
+        if len(pairs) == 0:
+            return list()
+        targets = pairs // span
+        diagonals = pairs % span - shift
+        # Pairs are sorted by target and then by diagonal.
+        bounds = numpy.flatnonzero(numpy.diff(targets)) + 1
+        firsts = numpy.concatenate([[0], bounds]).astype(int)
+        lasts = numpy.concatenate([bounds - 1, [len(pairs) - 1]]).astype(int)
+        return [(t, lo - band, hi + band) for t, lo, hi in zip(
+            targets[firsts].tolist(), diagonals[firsts].tolist(),
+            diagonals[lasts].tolist())]
+
+    def extend(self, aligner, query, target, lo, hi):
+        # Banded local alignment score of the query and a target. Only the
+        # target columns the band can reach are aligned.
+        a = query.asArray()
+        b = numpy.asarray(self.database.get(target).asArray())
+        m = len(a)
+        start = max(0, lo)
+        stop = min(len(b), m + hi)
+        if start >= stop:
+            return 0
+        b = b[start:stop]
+        f = banded.BandedMatrix(m, len(b), lo - start, hi - start)
+        banded.fill(f, a, b, aligner.scoring, aligner.gapScore, local=True)
+        return max(0, int(f.max()))
+
+    def search(self, aligner, query, minSeedHits=1, band=DEFAULT_BAND,
+               maxSeedOccurrences=None, topK=None, minScore=None):
+        # Local alignment scores of the candidate targets as (target, score)
+        # pairs, best first, like alignMany with topK. With a band wider
+        # than the sequences, the scores are those of aligner.align.
+        results = list()
+        for target, lo, hi in self.candidates(query, minSeedHits, band,
+                                              maxSeedOccurrences):
+            score = self.extend(aligner, query, target, lo, hi)
+            if minScore is None or score >= minScore:
+                results.append((target, score))
+        results.sort(key=lambda result: -result[1])
+        if topK is not None:
+            results = results[:topK]
+        return results
+
+    def __len__(self):
+        return len(self.database)
+
+    def __repr__(self):
+        return '%s(k=%d, %d sequences, %d seeds)' % (
+            type(self).__name__, self.k, len(self), len(self.keys))
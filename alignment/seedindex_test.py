@@ -0,0 +1,81 @@
+import random
+
+import numpy
+
+from .sequence import EncodedSequence
+from .sequencealigner import SimpleScoring
+from .sequencealigner import LocalSequenceAligner
+from .database import SequenceDatabase
+from .seedindex import SeedIndex
+
+
+ALIGNER = LocalSequenceAligner(SimpleScoring(2, -1), -2)
+
+
+def _randomSequences(count, seed=0):
+    rng = random.Random(seed)
+    return [EncodedSequence([rng.randint(1, 6)
+                             for _ in range(rng.randint(0, 30))], id=k)
+            for k in range(count)]
+
+
+def _kmers(sequence, k):
+    codes = sequence.asArray().tolist()
+    return set(tuple(codes[i:i + k]) for i in range(len(codes) - k + 1))
+
+
+def test_wide_band_matches_full_alignment():
+    sequences = _randomSequences(200)
+    index = SeedIndex.build(sequences, k=3)
+    for query in _randomSequences(20, seed=1):
+        results = index.search(ALIGNER, query, band=100)
+        seeds = _kmers(query, 3)
+        assert sorted(k for k, _ in results) == \
+            [k for k, s in enumerate(sequences) if seeds & _kmers(s, 3)]
+        for k, score in results:
+            assert score == ALIGNER.align(query, sequences[k])
+        scores = [score for _, score in results]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_knobs():
+    sequences = _randomSequences(200)
+    index = SeedIndex.build(sequences, k=3)
+    query = sequences[7]
+    assert index.search(ALIGNER, query, topK=1) == \
+        [(7, ALIGNER.align(query, query))]
+    everything = index.candidates(query)
+    strict = index.candidates(query, minSeedHits=len(query) - 2)
+    assert [c[0] for c in strict] == [7]
+    assert len(strict) < len(everything)
+    assert len(index.candidates(query, maxSeedOccurrences=0)) == 0
+    assert index.search(ALIGNER, EncodedSequence([1, 2])) == []
+
+
+def test_persistence(tmp_path):
+    sequences = _randomSequences(50)
+    path = str(tmp_path / 'index')
+    index = SeedIndex.write(path, sequences, k=4)
+    assert isinstance(index.positions, numpy.memmap)
+    assert index.k == 4
+    built = SeedIndex.build(sequences, k=4)
+    for query in sequences[:10]:
+        assert index.search(ALIGNER, query) == built.search(ALIGNER, query)
+
+
+def test_save_over_opened(tmp_path):
+    sequences = _randomSequences(500)
+    path = str(tmp_path / 'index')
+    SequenceDatabase.write(path, sequences)
+    # An index over the opened database and a reopened index saved over the
+    # files they map.
+    SeedIndex.build(SequenceDatabase.open(path), k=3).save(path)
+    index = SeedIndex.open(path)
+    index.save(path)
+    reopened = SeedIndex.open(path)
+    assert [s.key() for s in reopened.database] == \
+        [s.key() for s in sequences]
+    built = SeedIndex.build(sequences, k=3)
+    for query in sequences[:3]:
+        assert reopened.search(ALIGNER, query) == \
+            built.search(ALIGNER, query)
@@ -22,6 +22,12 @@ class BaseSequence(object):
     def key(self):
         return tuple(self.elements)
 
+    def asArray(self):
+        array = numpy.empty(len(self), object)
+        for i in range(len(self)):
+            array[i] = self[i]
+        return array
+
     def reversed(self):
         return type(self)(self.elements[::-1], id=self.id)
 
@@ -93,7 +99,7 @@ class EncodedSequence(BaseSequence):
             self.position = 0
         else:
             if isinstance(argument, numpy.ndarray) \
-                    and argument.dtype.name.startswith('int'):
+                    and numpy.issubdtype(argument.dtype, numpy.integer):
                 super(EncodedSequence, self).__init__(
                     numpy.array(argument), id)
             else:
@@ -101,6 +107,15 @@ class EncodedSequence(BaseSequence):
                     numpy.array(list(argument), int), id)
             self.position = len(self.elements)
 
+    @classmethod
+    def fromArray(cls, elements, id=None):
+        # Wrap an existing code array without copying it, e.g. a slice of a
+        # memory-mapped database. Read-only arrays make read-only sequences.
+        sequence = cls.__new__(cls)
+        BaseSequence.__init__(sequence, elements, id)
+        sequence.position = len(elements)
+        return sequence
+
     def push(self, element):
         self.elements[self.position] = element
         self.position += 1
@@ -112,6 +127,9 @@ class EncodedSequence(BaseSequence):
     def key(self):
         return tuple(int(e) for e in self.elements[:self.position])
 
+    def asArray(self):
+        return self.elements[:self.position]
+
     def reversed(self):
         return EncodedSequence(
             self.elements[self.position - len(self.elements) - 1::-1],
@@ -1,3 +1,5 @@
+from six import iteritems
+from six import itervalues
 from six import text_type
 from six.moves import range
 
@@ -5,11 +7,23 @@ try:
     import numpypy as numpy
 except ImportError:
     import numpy
+import hashlib
+import itertools
+import re
+import time
 from abc import ABCMeta
 from abc import abstractmethod
 
 from .sequence import GAP_CODE
 from .sequence import EncodedSequence
+from .profile import CompactProfile
+from . import backends
+from . import banded
+from . import batch
+from . import bitparallel
+from . import hirschberg
+from . import striped
+from . import wavefront
 
 
 # Scoring ---------------------------------------------------------------------
@@ -21,6 +35,28 @@ class Scoring(object):
     def __call__(self, firstElement, secondElement):
         return 0
 
+    def scoreMatrix(self, first, second):
+        scores = [[self(a, b) for b in second.asArray()]
+                  for a in first.asArray()]
+        return numpy.array(scores).reshape(len(first), len(second))
+
+    def scorePairs(self, firstElements, secondElements):
+        scores = [self(a, b) for a, b in zip(firstElements, secondElements)]
+        return numpy.array(scores).reshape(len(firstElements))
+
+    # Scorings with equal keys score all pairs the same. Arbitrary scorings
+    # are only known to equal themselves.
+    def key(self):
+        return type(self).__name__, id(self)
+
+    def hasContentKey(self):
+        # Identity keys are only meaningful while the scoring is alive and
+        # within one process.
+        return type(self).key is not Scoring.key
+
+    def isSymmetric(self):
+        return False
+
 
 class SimpleScoring(Scoring):
 
@@ -34,6 +70,72 @@ class SimpleScoring(Scoring):
         else:
             return self.mismatchScore
 
+    def scoreMatrix(self, first, second):
+        equal = numpy.equal.outer(first.asArray(), second.asArray())
+        return numpy.where(equal, self.matchScore, self.mismatchScore)
+
+    def scorePairs(self, firstElements, secondElements):
+        equal = firstElements == secondElements
+        return numpy.where(equal, self.matchScore, self.mismatchScore)
+
+    def key(self):
+        return type(self).__name__, self.matchScore, self.mismatchScore
+
+    def isSymmetric(self):
+        return True
+
+
+class MatrixScoring(Scoring):
+
+    def __init__(self, matrix):
+        matrix = numpy.asarray(matrix)
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError('scoring matrix must be a square 2-D array')
+        self.matrix = matrix
+
+    @classmethod
+    def fromSimpleScoring(cls, scoring, vocabulary):
+        equal = numpy.identity(len(vocabulary), bool)
+        return cls(numpy.where(equal, scoring.matchScore,
+                               scoring.mismatchScore))
+
+    @classmethod
+    def fromCallable(cls, function, vocabulary):
+        codes = range(len(vocabulary))
+        return cls([[function(a, b) for b in codes] for a in codes])
+
+    @classmethod
+    def fromDict(cls, scores, vocabulary, default=0, symmetric=True):
+        n = len(vocabulary)
+        dtype = numpy.result_type(default, *list(itervalues(scores)))
+        matrix = numpy.full((n, n), default, dtype)
+        for (a, b), score in iteritems(scores):
+            if not vocabulary.has(a) or not vocabulary.has(b):
+                continue
+            i = vocabulary.encode(a)
+            j = vocabulary.encode(b)
+            matrix[i, j] = score
+            if symmetric:
+                matrix[j, i] = score
+        return cls(matrix)
+
+    def __call__(self, firstElement, secondElement):
+        return self.matrix[firstElement, secondElement]
+
+    def scoreMatrix(self, first, second):
+        return self.matrix[numpy.ix_(first.asArray(), second.asArray())]
+
+    def scorePairs(self, firstElements, secondElements):
+        return self.matrix[firstElements, secondElements]
+
+    def key(self):
+        matrix = numpy.ascontiguousarray(self.matrix)
+        return (type(self).__name__, matrix.shape, str(matrix.dtype),
+                hashlib.sha1(matrix).hexdigest())
+
+    def isSymmetric(self):
+        return bool((self.matrix == self.matrix.T).all())
+
 
 # Alignment -------------------------------------------------------------------
 
@@ -90,6 +192,10 @@ class SequenceAlignment(object):
         second = self.second.reversed()
         return type(self)(first, second, self.gap, self)
 
+    def completed(self, i, j):
+        # The alignment pushed by a backtrace that ended in cell (i, j).
+        return self.reversed()
+
     def percentIdentity(self):
         try:
             return float(self.identicalCount) / len(self) * 100.0
@@ -145,23 +251,222 @@ class SequenceAlignment(object):
         return u'%s\n%s' % (u' '.join(first), u' '.join(second))
 
 
+# Column operations of compact alignments, as in extended CIGAR strings.
+MATCH_OP = '='
+MISMATCH_OP = 'X'
+# An element of the first sequence aligned to a gap.
+INSERT_OP = 'I'
+# An element of the second sequence aligned to a gap.
+DELETE_OP = 'D'
+
+_OPS = re.compile(r'(\d+)(\D)')
+
+
+class CompactSequenceAlignment(object):
+    # An alignment stored as its run-length encoded column operations, such
+    # as '3=1X2I', and the offsets where it starts in the aligned sequences.
+    # The gapped sequences and the statistics of SequenceAlignment are
+    # computed from these when needed.
+    __slots__ = ('ops', 'firstSequence', 'secondSequence', 'firstStart',
+                 'secondStart', 'gap', 'score', 'similarCount')
+
+    def __init__(self, ops, firstSequence, secondSequence, firstStart=0,
+                 secondStart=0, gap=GAP_CODE, score=0, similarCount=0):
+        self.ops = ops
+        self.firstSequence = firstSequence
+        self.secondSequence = secondSequence
+        self.firstStart = firstStart
+        self.secondStart = secondStart
+        self.gap = gap
+        self.score = score
+        self.similarCount = similarCount
+
+    def runs(self):
+        return [(int(count), op) for count, op in _OPS.findall(self.ops)]
+
+    def columnOps(self):
+        runs = self.runs()
+        return numpy.repeat(numpy.array([op for _, op in runs], 'U1'),
+                            [count for count, _ in runs])
+
+    def opCount(self, *ops):
+        return sum(count for count, op in self.runs() if op in ops)
+
+    @property
+    def first(self):
+        return self.gapped(self.firstSequence, self.firstStart, DELETE_OP)
+
+    @property
+    def second(self):
+        return self.gapped(self.secondSequence, self.secondStart, INSERT_OP)
+
+    def gapped(self, sequence, start, gapOp):
+        # The sequence as aligned, with gaps in the columns of gapOp.
+        # Compact profiles cannot be built from a list of soft elements and
+        # gaps, so they are aligned as plain profiles.
+        if isinstance(sequence, CompactProfile):
+            sequence = sequence.toProfile()
+        present = self.columnOps() != gapOp
+        positions = start + numpy.cumsum(present) - 1
+        elements = sequence.asArray()
+        if isinstance(sequence, EncodedSequence):
+            array = numpy.full(len(present), self.gap, elements.dtype)
+        else:
+            array = numpy.empty(len(present), object)
+            array[:] = [self.gap] * len(present)
+        array[present] = elements[positions[present]]
+        if isinstance(sequence, EncodedSequence):
+            return EncodedSequence.fromArray(array, id=sequence.id)
+        return type(sequence)(array.tolist(), id=sequence.id)
+
+    @property
+    def identicalCount(self):
+        return self.opCount(MATCH_OP)
+
+    @property
+    def gapCount(self):
+        return self.opCount(INSERT_OP, DELETE_OP)
+
+    def key(self):
+        return self.first.key(), self.second.key()
+
+    def percentIdentity(self):
+        try:
+            return float(self.identicalCount) / len(self) * 100.0
+        except ZeroDivisionError:
+            return 0.0
+
+    def percentSimilarity(self):
+        try:
+            return float(self.similarCount) / len(self) * 100.0
+        except ZeroDivisionError:
+            return 0.0
+
+    def percentGap(self):
+        try:
+            return float(self.gapCount) / len(self) * 100.0
+        except ZeroDivisionError:
+            return 0.0
+
+    def quality(self):
+        return self.score, \
+            self.percentIdentity(), \
+            self.percentSimilarity(), \
+            -self.percentGap()
+
+    def __len__(self):
+        return self.opCount(MATCH_OP, MISMATCH_OP, INSERT_OP, DELETE_OP)
+
+    def __getitem__(self, item):
+        return self.first[item], self.second[item]
+
+    def __repr__(self):
+        return '%s(%r, first=%d, second=%d)' % (
+            type(self).__name__, self.ops, self.firstStart, self.secondStart)
+
+    def __str__(self):
+        return str(SequenceAlignment(self.first, self.second, self.gap))
+
+    def __unicode__(self):
+        return SequenceAlignment(self.first, self.second,
+                                 self.gap).__unicode__()
+
+
+class CompactAlignmentBuilder(object):
+    # Takes the place of an empty alignment in the backtrace, which pushes
+    # the columns backwards and pops them again when it tries other paths.
+    # Only the operations are kept.
+
+    def __init__(self, first, second, gap=GAP_CODE):
+        self.firstSequence = first
+        self.secondSequence = second
+        self.gap = gap
+        self.ops = list()
+        self.scores = list()
+
+    def push(self, firstElement, secondElement, score=0):
+        if secondElement == self.gap:
+            self.ops.append(INSERT_OP)
+        elif firstElement == self.gap:
+            self.ops.append(DELETE_OP)
+        elif firstElement == secondElement:
+            self.ops.append(MATCH_OP)
+        else:
+            self.ops.append(MISMATCH_OP)
+        self.scores.append(score)
+
+    def pop(self):
+        self.ops.pop()
+        self.scores.pop()
+
+    def completed(self, i, j):
+        # The first column of the alignment is at cell (i + 1, j + 1).
+        runs = [(len(list(group)), op)
+                for op, group in itertools.groupby(reversed(self.ops))]
+        return CompactSequenceAlignment(
+            ''.join('%d%s' % run for run in runs),
+            self.firstSequence, self.secondSequence, i, j, self.gap,
+            sum(self.scores), sum(1 for score in self.scores if score > 0))
+
+
 # Aligner ---------------------------------------------------------------------
 
 class SequenceAligner(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self, scoring, gapScore):
+    def __init__(self, scoring, gapScore, usePointers=False, backend=None):
         self.scoring = scoring
         self.gapScore = gapScore
+        self.usePointers = usePointers
+        # Computes the matrix cells, see `backends`. None picks the fastest
+        # one available.
+        self.backend = backends.get(backend)
 
-    def align(self, first, second, backtrace=False):
-        f = self.computeAlignmentMatrix(first, second)
-        score = self.bestScore(f)
+    def key(self):
+        # Aligners with equal keys give the same results. The backend does
+        # not matter, all backends compute the same matrices.
+        return type(self).__name__, self.scoring.key(), self.gapScore
+
+    def isSymmetric(self):
+        # Whether swapping the sequences keeps the score.
+        return self.scoring.isSymmetric()
+
+    def align(self, first, second, backtrace=False, compact=False):
         if backtrace:
-            alignments = self.backtrace(first, second, f)
+            f, pointers = self.computeBacktraceMatrices(first, second)
+            score = self.bestScore(f)
+            alignments = self.backtrace(first, second, f, pointers, compact)
             return score, alignments
         else:
-            return score
+            return self.computeAlignmentScore(first, second)
+
+    def alignMany(self, query, targets, workers=None, chunksize=None,
+                  backtrace=False, topK=None, store=None):
+        return batch.alignMany(self, query, targets, workers, chunksize,
+                               backtrace, topK, store)
+
+    def pairwiseScores(self, sequences, workers=None, tileSize=64,
+                       symmetric=None, out=None, filename=None, store=None):
+        return batch.pairwiseScores(self, sequences, workers, tileSize,
+                                    symmetric, out, filename, store)
+
+    # The asynchronous methods share a thread pool; use an AsyncAligner from
+    # alignment.asyncalign for other executors and limits.
+
+    def alignAsync(self, first, second, backtrace=False, timeout=None):
+        from .asyncalign import frontEnd
+        return frontEnd(self).alignAsync(first, second, backtrace, timeout)
+
+    def alignManyAsync(self, query, targets, backtrace=False, timeout=None):
+        from .asyncalign import frontEnd
+        return frontEnd(self).alignManyAsync(query, targets, backtrace,
+                                             timeout)
+
+    def alignmentFromColumns(self, first, second, columns):
+        alignment = self.emptyAlignment(first, second)
+        for firstElement, secondElement, score in reversed(columns):
+            alignment.push(firstElement, secondElement, score)
+        return alignment.reversed()
 
     def emptyAlignment(self, first, second):
         # Pre-allocate sequences.
@@ -170,103 +475,208 @@ class SequenceAligner(object):
             EncodedSequence(len(first) + len(second), id=second.id),
         )
 
+    def emptyCompactAlignment(self, first, second):
+        # Collects the columns of a backtrace into a CompactSequenceAlignment.
+        return CompactAlignmentBuilder(first, second)
+
+    def computeAlignmentScore(self, first, second):
+        return self.bestScore(self.computeAlignmentMatrix(first, second))
+
+    def computeBacktraceMatrices(self, first, second):
+        if self.usePointers:
+            pointers = numpy.zeros((len(first) + 1, len(second) + 1),
+                                   numpy.uint8)
+            f = self.computeAlignmentMatrix(first, second, pointers)
+            return f, pointers
+        else:
+            return self.computeAlignmentMatrix(first, second), None
+
+    # When a `pointers` matrix is given, it is filled with the bitwise OR of
+    # the optimal moves into each cell (see wavefront.DIAGONAL_MOVE etc.).
     @abstractmethod
-    def computeAlignmentMatrix(self, first, second):
+    def computeAlignmentMatrix(self, first, second, pointers=None):
         return numpy.zeros(0, int)
 
     @abstractmethod
     def bestScore(self, f):
         return 0
 
+    def backtrace(self, first, second, f, pointers=None, compact=False):
+        return list(self.iterBacktrace(first, second, f, pointers=pointers,
+                                       compact=compact))
+
+    def iterAlignments(self, first, second, maxAlignments=None,
+                       timeout=None, compact=False):
+        f, pointers = self.computeBacktraceMatrices(first, second)
+        return self.iterBacktrace(first, second, f, maxAlignments, timeout,
+                                  pointers, compact)
+
+    def iterBacktrace(self, first, second, f, maxAlignments=None,
+                      timeout=None, pointers=None, compact=False):
+        # Alignments are generated lazily. Enumeration silently stops once
+        # maxAlignments alignments were generated or timeout seconds passed.
+        if maxAlignments is not None and maxAlignments <= 0:
+            return
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = time.time() + timeout
+        count = 0
+        for i, j in self.backtraceStarts(f):
+            if compact:
+                alignment = self.emptyCompactAlignment(first, second)
+            else:
+                alignment = self.emptyAlignment(first, second)
+            for result in self.iterBacktraceFrom(first, second, f, i, j,
+                                                 alignment, deadline,
+                                                 pointers):
+                yield result
+                count += 1
+                if maxAlignments is not None and count >= maxAlignments:
+                    return
+            if deadline is not None and time.time() > deadline:
+                return
+
+    def iterBacktraceFrom(self, first, second, f, i, j, alignment,
+                          deadline=None, pointers=None):
+        moves = self.backtraceMoves(first, second, f, i, j, alignment.gap,
+                                    pointers)
+        if moves is None:
+            yield alignment.completed(i, j)
+            return
+        # Each stack entry holds the remaining moves out of a cell and
+        # whether entering that cell pushed a column onto the alignment.
+        stack = [(iter(moves), False)]
+        while stack:
+            if deadline is not None and time.time() > deadline:
+                return
+            remaining, pushed = stack[-1]
+            move = next(remaining, None)
+            if move is None:
+                stack.pop()
+                if pushed:
+                    alignment.pop()
+                continue
+            i, j, column = move
+            if column is not None:
+                alignment.push(*column)
+            moves = self.backtraceMoves(first, second, f, i, j,
+                                        alignment.gap, pointers)
+            if moves is None:
+                yield alignment.completed(i, j)
+                if column is not None:
+                    alignment.pop()
+            else:
+                stack.append((iter(moves), column is not None))
+
+    def backtraceFrom(self, first, second, f, i, j, alignments, alignment):
+        alignments.extend(
+            self.iterBacktraceFrom(first, second, f, i, j, alignment))
+
     @abstractmethod
-    def backtrace(self, first, second, f):
+    def backtraceStarts(self, f):
         return list()
 
+    # Returns None when (i, j) is where a backtrace ends and the list of
+    # moves (i, j, column) out of it otherwise. `column` is the
+    # (firstElement, secondElement, score) triple to push onto the
+    # alignment or None if the move does not produce a column. Moves are
+    # read from `pointers` when given and re-derived from `f` otherwise.
+    @abstractmethod
+    def backtraceMoves(self, first, second, f, i, j, gap, pointers=None):
+        return None
+
 
 class GlobalSequenceAligner(SequenceAligner):
 
-    def __init__(self, scoring, gapScore):
-        super(GlobalSequenceAligner, self).__init__(scoring, gapScore)
+    def __init__(self, scoring, gapScore, usePointers=False, backend=None):
+        super(GlobalSequenceAligner, self).__init__(scoring, gapScore,
+                                                    usePointers, backend)
 
-    def computeAlignmentMatrix(self, first, second):
+    def computeAlignmentMatrix(self, first, second, pointers=None):
         m = len(first) + 1
         n = len(second) + 1
         f = numpy.zeros((m, n), int)
-        for i in range(1, m):
-            for j in range(1, n):
-                # Match elements.
-                ab = f[i - 1, j - 1] \
-                    + self.scoring(first[i - 1], second[j - 1])
-
-                # Gap on first sequence.
-                if i == m - 1:
-                    ga = f[i, j - 1]
-                else:
-                    ga = f[i, j - 1] + self.gapScore
-
-                # Gap on second sequence.
-                if j == n - 1:
-                    gb = f[i - 1, j]
-                else:
-                    gb = f[i - 1, j] + self.gapScore
-
-                f[i, j] = max(ab, max(ga, gb))
-        return f
+        scores = self.scoring.scoreMatrix(first, second)
+        return self.backend.fill(f, scores, self.gapScore, freeEndGaps=True,
+                                 pointers=pointers)
+
+    def computeAlignmentScore(self, first, second):
+        return self.computeBestCell(first, second)[0]
+
+    def computeBestCell(self, first, second):
+        return self.backend.bestCell(first.asArray(), second.asArray(),
+                                     self.scoring, self.gapScore,
+                                     freeEndGaps=True)
+
+    def alignLinearSpace(self, first, second):
+        columns = hirschberg.globalColumns(
+            first.asArray(), second.asArray(), self.scoring, self.gapScore,
+            self.emptyAlignment(first, second).gap)
+        alignment = self.alignmentFromColumns(first, second, columns)
+        return hirschberg.pathScore(columns), alignment
+
+    def alignBanded(self, first, second, band, backtrace=False):
+        f = self.computeBandedMatrix(first, second, band)
+        score = self.bestScore(f)
+        if backtrace:
+            return score, self.backtrace(first, second, f)
+        else:
+            return score
+
+    def computeBandedMatrix(self, first, second, band):
+        f = banded.BandedMatrix.aroundDiagonal(len(first), len(second), band)
+        return banded.fill(f, first.asArray(), second.asArray(),
+                           self.scoring, self.gapScore, freeEndGaps=True)
 
     def bestScore(self, f):
         return f[-1, -1]
 
-    def backtrace(self, first, second, f):
+    def backtraceStarts(self, f):
         m, n = f.shape
-        alignments = list()
-        alignment = self.emptyAlignment(first, second)
-        self.backtraceFrom(first, second, f, m - 1, n - 1,
-                           alignments, alignment)
-        return alignments
+        return [(m - 1, n - 1)]
 
-    def backtraceFrom(self, first, second, f, i, j, alignments, alignment):
+    def backtraceMoves(self, first, second, f, i, j, gap, pointers=None):
         if i == 0 or j == 0:
-            alignments.append(alignment.reversed())
-        else:
-            m, n = f.shape
-            c = f[i, j]
+            return None
+        m, n = f.shape
+        c = f[i, j]
+        a = first[i - 1]
+        b = second[j - 1]
+        if pointers is None:
             p = f[i - 1, j - 1]
-            x = f[i - 1, j]
-            y = f[i, j - 1]
-            a = first[i - 1]
-            b = second[j - 1]
             if c == p + self.scoring(a, b):
-                alignment.push(a, b, c - p)
-                self.backtraceFrom(first, second, f, i - 1, j - 1,
-                                   alignments, alignment)
-                alignment.pop()
+                return [(i - 1, j - 1, (a, b, c - p))]
+            bits = 0
+            if c == f[i, j - 1] + (0 if i == m - 1 else self.gapScore):
+                bits |= wavefront.LEFT_MOVE
+            if c == f[i - 1, j] + (0 if j == n - 1 else self.gapScore):
+                bits |= wavefront.UP_MOVE
+        else:
+            bits = pointers[i, j]
+            if bits & wavefront.DIAGONAL_MOVE:
+                return [(i - 1, j - 1, (a, b, c - f[i - 1, j - 1]))]
+        moves = list()
+        if bits & wavefront.LEFT_MOVE:
+            if i == m - 1:
+                moves.append((i, j - 1, None))
             else:
-                if i == m - 1:
-                    if c == y:
-                        self.backtraceFrom(first, second, f, i, j - 1,
-                                           alignments, alignment)
-                elif c == y + self.gapScore:
-                    alignment.push(alignment.gap, b, c - y)
-                    self.backtraceFrom(first, second, f, i, j - 1,
-                                       alignments, alignment)
-                    alignment.pop()
-                if j == n - 1:
-                    if c == x:
-                        self.backtraceFrom(first, second, f, i - 1, j,
-                                           alignments, alignment)
-                elif c == x + self.gapScore:
-                    alignment.push(a, alignment.gap, c - x)
-                    self.backtraceFrom(first, second, f, i - 1, j,
-                                       alignments, alignment)
-                    alignment.pop()
+                moves.append((i, j - 1, (gap, b, c - f[i, j - 1])))
+        if bits & wavefront.UP_MOVE:
+            if j == n - 1:
+                moves.append((i - 1, j, None))
+            else:
+                moves.append((i - 1, j, (a, gap, c - f[i - 1, j])))
+        return moves
 
 
 class StrictGlobalSequenceAligner(SequenceAligner):
 
-    def __init__(self, scoring, gapScore):
-        super(StrictGlobalSequenceAligner, self).__init__(scoring, gapScore)
+    def __init__(self, scoring, gapScore, usePointers=False, backend=None):
+        super(StrictGlobalSequenceAligner, self).__init__(scoring, gapScore,
+                                                          usePointers, backend)
 
-    def computeAlignmentMatrix(self, first, second):
+    def computeAlignmentMatrix(self, first, second, pointers=None):
         m = len(first) + 1
         n = len(second) + 1
         f = numpy.zeros((m, n), int)
@@ -274,132 +684,267 @@ class StrictGlobalSequenceAligner(SequenceAligner):
             f[i, 0] = f[i - 1, 0] + self.gapScore
         for j in range(1, n):
             f[0, j] = f[0, j - 1] + self.gapScore
-        for i in range(1, m):
-            for j in range(1, n):
-                # Match elements.
-                ab = f[i - 1, j - 1] \
-                    + self.scoring(first[i - 1], second[j - 1])
-
-                # Gap on first sequence.
-                ga = f[i, j - 1] + self.gapScore
-
-                # Gap on second sequence.
-                gb = f[i - 1, j] + self.gapScore
+        if pointers is not None:
+            pointers[1:, 0] = wavefront.UP_MOVE
+            pointers[0, 1:] = wavefront.LEFT_MOVE
+        scores = self.scoring.scoreMatrix(first, second)
+        return self.backend.fill(f, scores, self.gapScore, pointers=pointers)
+
+    def computeAlignmentScore(self, first, second):
+        if self.isUnitCost():
+            return -bitparallel.distance(first.asArray(), second.asArray())
+        return self.computeBestCell(first, second)[0]
+
+    def computeBestCell(self, first, second):
+        return self.backend.bestCell(first.asArray(), second.asArray(),
+                                     self.scoring, self.gapScore,
+                                     boundaryGaps=True)
+
+    def isUnitCost(self):
+        # With these scores the alignment score is the negated Levenshtein
+        # distance, which has a much faster bit-parallel algorithm.
+        return (type(self.scoring) is SimpleScoring
+                and self.scoring.matchScore == 0
+                and self.scoring.mismatchScore == -1
+                and self.gapScore == -1)
+
+    def alignBitParallel(self, first, second):
+        if not self.isUnitCost():
+            raise ValueError('bit-parallel alignment requires unit costs')
+        columns = bitparallel.editColumns(first.asArray(), second.asArray())
+        alignment = self.alignmentFromColumns(first, second, columns)
+        return alignment.score, alignment
+
+    def alignLinearSpace(self, first, second):
+        columns = hirschberg.strictGlobalColumns(
+            first.asArray(), second.asArray(), self.scoring, self.gapScore,
+            self.emptyAlignment(first, second).gap)
+        alignment = self.alignmentFromColumns(first, second, columns)
+        return hirschberg.pathScore(columns), alignment
+
+    def alignBanded(self, first, second, band=None, backtrace=False):
+        # Without a band, start narrow and double the band until no path
+        # leaving it can beat the best path inside.
+        if band is None:
+            a = first.asArray()
+            b = second.asArray()
+            maxScore = banded.substitutionBound(a, b, self.scoring)
+            band = banded.INITIAL_BAND
+            while True:
+                f = self.computeBandedMatrix(first, second, band)
+                if f.coversAll():
+                    break
+                bound = banded.outsideBound(len(a), len(b), band, maxScore,
+                                            self.gapScore)
+                if self.gapScore < 0 and self.bestScore(f) >= bound:
+                    break
+                band *= 2
+        else:
+            f = self.computeBandedMatrix(first, second, band)
+        score = self.bestScore(f)
+        if backtrace:
+            return score, self.backtrace(first, second, f)
+        else:
+            return score
 
-                f[i, j] = max(ab, max(ga, gb))
-        return f
+    def computeBandedMatrix(self, first, second, band):
+        f = banded.BandedMatrix.aroundDiagonal(len(first), len(second), band)
+        return banded.fill(f, first.asArray(), second.asArray(),
+                           self.scoring, self.gapScore, boundaryGaps=True)
 
     def bestScore(self, f):
         return f[-1, -1]
 
-    def backtrace(self, first, second, f):
+    def backtraceStarts(self, f):
         m, n = f.shape
-        alignments = list()
-        alignment = self.emptyAlignment(first, second)
-        self.backtraceFrom(first, second, f, m - 1, n - 1,
-                           alignments, alignment)
-        return alignments
+        return [(m - 1, n - 1)]
 
-    def backtraceFrom(self, first, second, f, i, j, alignments, alignment):
+    def backtraceMoves(self, first, second, f, i, j, gap, pointers=None):
         if i == 0 and j == 0:
-            alignments.append(alignment.reversed())
-        else:
-            c = f[i, j]
-            if i != 0:
-                x = f[i - 1, j]
-                a = first[i - 1]
-                if c == x + self.gapScore:
-                    alignment.push(a, alignment.gap, c - x)
-                    self.backtraceFrom(first, second, f, i - 1, j,
-                                       alignments, alignment)
-                    alignment.pop()
-                    return
-            if j != 0:
-                y = f[i, j - 1]
-                b = second[j - 1]
-                if c == y + self.gapScore:
-                    alignment.push(alignment.gap, b, c - y)
-                    self.backtraceFrom(first, second, f, i, j - 1,
-                                       alignments, alignment)
-                    alignment.pop()
-            if i != 0 and j != 0:
-                p = f[i - 1, j - 1]
-                # Silence the code inspection warning. We know at this point
-                # that a and b are assigned to values.
-                # noinspection PyUnboundLocalVariable
-                if c == p + self.scoring(a, b):
-                    alignment.push(a, b, c - p)
-                    self.backtraceFrom(first, second, f, i - 1, j - 1,
-                                       alignments, alignment)
-                    alignment.pop()
+            return None
+        c = f[i, j]
+        if pointers is not None:
+            bits = pointers[i, j]
+        if i != 0:
+            x = f[i - 1, j]
+            a = first[i - 1]
+            if pointers is None:
+                up = c == x + self.gapScore
+            else:
+                up = bits & wavefront.UP_MOVE
+            if up:
+                return [(i - 1, j, (a, gap, c - x))]
+        moves = list()
+        if j != 0:
+            y = f[i, j - 1]
+            b = second[j - 1]
+            if pointers is None:
+                left = c == y + self.gapScore
+            else:
+                left = bits & wavefront.LEFT_MOVE
+            if left:
+                moves.append((i, j - 1, (gap, b, c - y)))
+        if i != 0 and j != 0:
+            p = f[i - 1, j - 1]
+            # Silence the code inspection warning. We know at this point
+            # that a and b are assigned to values.
+            # noinspection PyUnboundLocalVariable
+            if pointers is None:
+                diagonal = c == p + self.scoring(a, b)
+            else:
+                diagonal = bits & wavefront.DIAGONAL_MOVE
+            if diagonal:
+                moves.append((i - 1, j - 1, (a, b, c - p)))
+        return moves
 
 
 class LocalSequenceAligner(SequenceAligner):
 
-    def __init__(self, scoring, gapScore, minScore=None):
-        super(LocalSequenceAligner, self).__init__(scoring, gapScore)
+    def __init__(self, scoring, gapScore, minScore=None, usePointers=False,
+                 backend=None):
+        super(LocalSequenceAligner, self).__init__(scoring, gapScore,
+                                                   usePointers, backend)
         self.minScore = minScore
 
-    def computeAlignmentMatrix(self, first, second):
+    def computeAlignmentMatrix(self, first, second, pointers=None):
         m = len(first) + 1
         n = len(second) + 1
         f = numpy.zeros((m, n), int)
-        for i in range(1, m):
-            for j in range(1, n):
-                # Match elements.
-                ab = f[i - 1, j - 1] \
-                    + self.scoring(first[i - 1], second[j - 1])
+        scores = self.scoring.scoreMatrix(first, second)
+        return self.backend.fill(f, scores, self.gapScore, local=True,
+                                 pointers=pointers)
 
-                # Gap on sequenceA.
-                ga = f[i, j - 1] + self.gapScore
+    def computeAlignmentScore(self, first, second):
+        return self.computeBestCell(first, second)[0]
 
-                # Gap on sequenceB.
-                gb = f[i - 1, j] + self.gapScore
+    def computeBestCell(self, first, second):
+        return self.backend.bestCell(first.asArray(), second.asArray(),
+                                     self.scoring, self.gapScore,
+                                     local=True)
 
-                f[i, j] = max(0, max(ab, max(ga, gb)))
-        return f
+    def key(self):
+        return super(LocalSequenceAligner, self).key() + (self.minScore,)
+
+    def queryProfile(self, query, segmentCount=None):
+        # Striped engine for aligning one query against many targets.
+        # profile.alignMany(targets) gives the same scores as align().
+        return striped.QueryProfile(query, self.scoring, self.gapScore,
+                                    segmentCount)
+
+    def topK(self, first, second, k, minScore=None):
+        # The k best local alignments that share no aligned pair of
+        # elements (Waterman-Eggert), best first. Once an alignment is
+        # taken, its pairs are forbidden and the cells they change are
+        # filled again.
+        if minScore is None:
+            minScore = self.minScore
+        f = numpy.zeros((len(first) + 1, len(second) + 1), int)
+        pointers = numpy.zeros(f.shape, numpy.uint8)
+        scores = numpy.asarray(self.scoring.scoreMatrix(first, second))
+        # A copy wide enough to hold the score of forbidden pairs, also for
+        # scorings with narrow or unsigned matrices.
+        scores = scores.astype(numpy.result_type(scores.dtype, numpy.int64))
+        self.backend.fill(f, scores, self.gapScore, local=True,
+                          pointers=pointers)
+        gap = self.emptyAlignment(first, second).gap
+        alignments = list()
+        while len(alignments) < k:
+            i, j = numpy.unravel_index(numpy.argmax(f), f.shape)
+            if f[i, j] <= 0 or (minScore is not None and f[i, j] < minScore):
+                break
+            columns = list()
+            pairs = list()
+            moves = self.backtraceMoves(first, second, f, i, j, gap,
+                                        pointers)
+            while moves is not None:
+                nextI, nextJ, column = moves[0]
+                if nextI < i and nextJ < j:
+                    pairs.append((i - 1, j - 1))
+                columns.append(column)
+                i, j = nextI, nextJ
+                moves = self.backtraceMoves(first, second, f, i, j, gap,
+                                            pointers)
+            alignments.append(
+                self.alignmentFromColumns(first, second, columns[::-1]))
+
+            self.forbid(f, pointers, scores, pairs)
+        return alignments
+
+    def forbid(self, f, pointers, scores, pairs):
+        # Gives the element pairs a score that never wins a maximum, like
+        # the cells outside a band, and fills the cells that change again.
+        # Changes only spread down and to the right, so every row is swept
+        # from the first column that may change and the sweep stops at the
+        # first cell past the changes above it and the forbidden pairs in
+        # it that keeps its value.
+        m, n = scores.shape
+        forbidden = dict()
+        for row, col in pairs:
+            scores[row, col] = banded.UNREACHABLE
+            low, high = forbidden.get(row + 1, (col + 1, col + 1))
+            forbidden[row + 1] = (min(low, col + 1), max(high, col + 1))
+        # The columns that changed in the row above.
+        low, high = n + 1, 0
+        last = max(forbidden)
+        i = min(forbidden)
+        while i <= m and (low <= high or i <= last):
+            start, stop = low, high + 1
+            if i in forbidden:
+                start = min(start, forbidden[i][0])
+                stop = max(stop, forbidden[i][1])
+            low, high = n + 1, 0
+            j = start
+            while j <= n:
+                ab = f[i - 1, j - 1] + scores[i - 1, j - 1]
+                ga = f[i, j - 1] + self.gapScore
+                gb = f[i - 1, j] + self.gapScore
+                best = max(ab, ga, gb, 0)
+                pointers[i, j] = (
+                    (wavefront.DIAGONAL_MOVE if ab == best else 0) |
+                    (wavefront.LEFT_MOVE if ga == best else 0) |
+                    (wavefront.UP_MOVE if gb == best else 0))
+                if int(best) != f[i, j]:
+                    f[i, j] = best
+                    low = min(low, j)
+                    high = j
+                elif j >= stop:
+                    break
+                j += 1
+            i += 1
 
     def bestScore(self, f):
         return f.max()
 
-    def backtrace(self, first, second, f):
-        m, n = f.shape
-        alignments = list()
-        alignment = self.emptyAlignment(first, second)
+    def backtraceStarts(self, f):
         if self.minScore is None:
             minScore = self.bestScore(f)
         else:
             minScore = self.minScore
-        for i in range(m):
-            for j in range(n):
-                if f[i, j] >= minScore:
-                    self.backtraceFrom(first, second, f, i, j,
-                                       alignments, alignment)
-        return alignments
+        return [(int(i), int(j)) for i, j in numpy.argwhere(f >= minScore)]
 
-    def backtraceFrom(self, first, second, f, i, j, alignments, alignment):
+    def backtraceMoves(self, first, second, f, i, j, gap, pointers=None):
         if f[i, j] == 0:
-            alignments.append(alignment.reversed())
-        else:
-            c = f[i, j]
-            p = f[i - 1, j - 1]
-            x = f[i - 1, j]
-            y = f[i, j - 1]
-            a = first[i - 1]
-            b = second[j - 1]
+            return None
+        c = f[i, j]
+        p = f[i - 1, j - 1]
+        x = f[i - 1, j]
+        y = f[i, j - 1]
+        a = first[i - 1]
+        b = second[j - 1]
+        if pointers is None:
             if c == p + self.scoring(a, b):
-                alignment.push(a, b, c - p)
-                self.backtraceFrom(first, second, f, i - 1, j - 1,
-                                   alignments, alignment)
-                alignment.pop()
-            else:
-                if c == y + self.gapScore:
-                    alignment.push(alignment.gap, b, c - y)
-                    self.backtraceFrom(first, second, f, i, j - 1,
-                                       alignments, alignment)
-                    alignment.pop()
-                if c == x + self.gapScore:
-                    alignment.push(a, alignment.gap, c - x)
-                    self.backtraceFrom(first, second, f, i - 1, j,
-                                       alignments, alignment)
-                    alignment.pop()
+                return [(i - 1, j - 1, (a, b, c - p))]
+            left = c == y + self.gapScore
+            up = c == x + self.gapScore
+        else:
+            bits = pointers[i, j]
+            if bits & wavefront.DIAGONAL_MOVE:
+                return [(i - 1, j - 1, (a, b, c - p))]
+            left = bits & wavefront.LEFT_MOVE
+            up = bits & wavefront.UP_MOVE
+        moves = list()
+        if left:
+            moves.append((i, j - 1, (gap, b, c - y)))
+        if up:
+            moves.append((i - 1, j, (a, gap, c - x)))
+        return moves
@@ -1,8 +1,14 @@
+import copy
 from abc import ABCMeta
 
+import numpy
+import pytest
+
 from .vocabulary import Vocabulary
 from .sequence import Sequence
+from .sequencealigner import CompactSequenceAlignment
 from .sequencealigner import SimpleScoring
+from .sequencealigner import MatrixScoring
 from .sequencealigner import GlobalSequenceAligner
 from .sequencealigner import StrictGlobalSequenceAligner
 from .sequencealigner import LocalSequenceAligner
@@ -95,6 +101,74 @@ class SequenceAlignerTests(object):
         assert score == DEFAULT_MATCH_SCORE * 2 + DEFAULT_MISMATCH_SCORE
         assert alignments[0].score == score
 
+    def test_score_only_matches_matrix(self):
+        vocab = Vocabulary()
+        for first, second in [('xabcabcy', 'abc'), ('abxc', 'axbc'),
+                              ('', 'ab'), ('ab', ''), ('aac', 'bac')]:
+            first = vocab.encodeSequence(Sequence(first))
+            second = vocab.encodeSequence(Sequence(second))
+            f = self.ALIGNER.computeAlignmentMatrix(first, second)
+            assert self.ALIGNER.align(first, second) == \
+                self.ALIGNER.bestScore(f)
+
+    def test_iter_alignments_is_bounded(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('abxc' * 3))
+        second = vocab.encodeSequence(Sequence('axbc' * 3))
+        f = self.ALIGNER.computeAlignmentMatrix(first, second)
+        expected = [a.key() for a in self.ALIGNER.backtrace(first, second, f)]
+        actual = [a.key() for a in self.ALIGNER.iterAlignments(
+            first, second, maxAlignments=2)]
+        assert actual == expected[:2]
+        assert list(self.ALIGNER.iterAlignments(
+            first, second, maxAlignments=0)) == []
+
+    def test_compact_alignments(self):
+        for first, second in [('xabcabcy', 'abc'), ('abxc', 'axbc'),
+                              ('ab', 'xy'), ('aac', 'bac')]:
+            score, expected = self.align(first, second)
+            compactScore, actual = _align(first, second, self.ALIGNER,
+                                          compact=True)
+            assert compactScore == score
+            assert len(actual) == len(expected)
+            for a, b in zip(actual, expected):
+                assert isinstance(a, CompactSequenceAlignment)
+                assert a.key() == b.key()
+                assert a.quality() == b.quality()
+                assert str(a) == str(b)
+
+    def test_iter_alignments_without_recursion_limit(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('ab' * 1500))
+        second = vocab.encodeSequence(Sequence('ab' * 1500))
+        alignment = next(self.ALIGNER.iterAlignments(first, second))
+        assert len(alignment) == 3000
+        assert alignment.score == DEFAULT_MATCH_SCORE * 3000
+
+    def test_pointer_backtrace(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xabcabcyabxc'))
+        second = vocab.encodeSequence(Sequence('abcaxbcz'))
+        expected = self.ALIGNER.align(first, second, backtrace=True)
+
+        calls = list()
+
+        class CountingScoring(SimpleScoring):
+            def __call__(self, firstElement, secondElement):
+                calls.append((firstElement, secondElement))
+                return super(CountingScoring, self).__call__(
+                    firstElement, secondElement)
+
+        aligner = copy.copy(self.ALIGNER)
+        aligner.scoring = CountingScoring(DEFAULT_MATCH_SCORE,
+                                          DEFAULT_MISMATCH_SCORE)
+        aligner.usePointers = True
+        score, alignments = aligner.align(first, second, backtrace=True)
+        assert score == expected[0]
+        assert [a.key() for a in alignments] == \
+            [a.key() for a in expected[1]]
+        assert calls == []
+
 
 class TestGlobalSequenceAligner(SequenceAlignerTests):
     ALIGNER = GlobalSequenceAligner(DEFAULT_SCORING, DEFAULT_GAP_SCORE)
@@ -123,6 +197,32 @@ class TestGlobalSequenceAligner(SequenceAlignerTests):
         assert score == DEFAULT_MATCH_SCORE * 2 + DEFAULT_MISMATCH_SCORE
         assert alignments[0].score == score
 
+    def test_linear_space_alignment(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xabcabcyabzc' * 10))
+        second = vocab.encodeSequence(Sequence('abcqabyabcz' * 10))
+        score, alignments = self.ALIGNER.align(first, second, backtrace=True)
+        linearScore, alignment = self.ALIGNER.alignLinearSpace(first, second)
+        assert linearScore == score
+        assert alignment.score == score
+        assert alignment.identicalCount == sum(
+            1 for a, b in zip(alignment.first, alignment.second) if a == b)
+        assert alignment.gapCount == sum(
+            1 for a, b in zip(alignment.first, alignment.second)
+            if a == alignment.gap or b == alignment.gap)
+
+    def test_banded_alignment(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xabcabcyabzc' * 5))
+        second = vocab.encodeSequence(Sequence('xabcabyabzcq' * 5))
+        score, alignments = self.ALIGNER.align(first, second, backtrace=True)
+        bandedScore, bandedAlignments = self.ALIGNER.alignBanded(
+            first, second, 4, backtrace=True)
+        assert bandedScore == score
+        assert [a.key() for a in bandedAlignments] == \
+            [a.key() for a in alignments]
+        assert self.ALIGNER.alignBanded(first, second, 0) <= score
+
 
 class TestStrictGlobalSequenceAligner(SequenceAlignerTests):
     ALIGNER = StrictGlobalSequenceAligner(DEFAULT_SCORING, DEFAULT_GAP_SCORE)
@@ -182,6 +282,61 @@ class TestStrictGlobalSequenceAligner(SequenceAlignerTests):
         assert score == DEFAULT_MATCH_SCORE * 3 + DEFAULT_GAP_SCORE * 5
         assert alignments[0].score == score
 
+    def test_linear_space_alignment(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xabcabcyabzc' * 10))
+        second = vocab.encodeSequence(Sequence('abcqabyabcz' * 10))
+        score, alignments = self.ALIGNER.align(first, second, backtrace=True)
+        linearScore, alignment = self.ALIGNER.alignLinearSpace(first, second)
+        assert linearScore == score
+        assert alignment.score == score
+        assert alignment.identicalCount == sum(
+            1 for a, b in zip(alignment.first, alignment.second) if a == b)
+        assert alignment.gapCount == sum(
+            1 for a, b in zip(alignment.first, alignment.second)
+            if a == alignment.gap or b == alignment.gap)
+
+    def test_banded_alignment(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xabcabcyabzc' * 5))
+        second = vocab.encodeSequence(Sequence('xabcabyabzcq' * 5))
+        score, alignments = self.ALIGNER.align(first, second, backtrace=True)
+        bandedScore, bandedAlignments = self.ALIGNER.alignBanded(
+            first, second, 4, backtrace=True)
+        assert bandedScore == score
+        assert [a.key() for a in bandedAlignments] == \
+            [a.key() for a in alignments]
+        assert self.ALIGNER.alignBanded(first, second, 0) <= score
+
+    def test_adaptive_banded_alignment(self):
+        vocab = Vocabulary()
+        for first, second in [('xabcabcyabzc' * 5, 'abcqabyabcz' * 3),
+                              ('ab' * 30, 'ba' * 25), ('', 'abc')]:
+            first = vocab.encodeSequence(Sequence(first))
+            second = vocab.encodeSequence(Sequence(second))
+            assert self.ALIGNER.alignBanded(first, second) == \
+                self.ALIGNER.align(first, second)
+
+    def test_bit_parallel_alignment(self):
+        aligner = StrictGlobalSequenceAligner(SimpleScoring(0, -1), -1)
+        assert aligner.isUnitCost()
+        vocab = Vocabulary()
+        for first, second in [('kitten', 'sitting'), ('', 'abc'),
+                              ('xabcabcyabzc' * 7, 'abcqabyabcz' * 8)]:
+            first = vocab.encodeSequence(Sequence(first))
+            second = vocab.encodeSequence(Sequence(second))
+            expected = aligner.computeBestCell(first, second)[0]
+            assert aligner.align(first, second) == expected
+            score, alignment = aligner.alignBitParallel(first, second)
+            assert score == alignment.score == expected
+            expectedAlignment = next(aligner.iterAlignments(first, second))
+            assert alignment.key() == expectedAlignment.key()
+        kitten = vocab.encodeSequence(Sequence('kitten'))
+        sitting = vocab.encodeSequence(Sequence('sitting'))
+        assert aligner.align(kitten, sitting) == -3
+        with pytest.raises(ValueError):
+            self.ALIGNER.alignBitParallel(kitten, sitting)
+
 
 class TestLocalSequenceAligner(SequenceAlignerTests):
     ALIGNER = LocalSequenceAligner(DEFAULT_SCORING, DEFAULT_GAP_SCORE)
@@ -222,3 +377,111 @@ class TestLocalSequenceAligner(SequenceAlignerTests):
         assert alignments[0].percentGap() == 0.0
         assert score == DEFAULT_MATCH_SCORE * 2
         assert alignments[0].score == score
+
+    def test_best_cell(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xxabcy'))
+        second = vocab.encodeSequence(Sequence('zabcz'))
+        score, i, j = self.ALIGNER.computeBestCell(first, second)
+        assert score == DEFAULT_MATCH_SCORE * 3
+        assert (i, j) == (5, 4)
+
+    def test_query_profile(self):
+        vocab = Vocabulary()
+        query = vocab.encodeSequence(Sequence('abcabxcabyc'))
+        targets = [vocab.encodeSequence(Sequence(s)) for s in (
+            'zabcz', 'cba', '', 'abcxabcyabc', 'aaaaabbbbbcccccabc', 'y')]
+        expected = [self.ALIGNER.align(query, t) for t in targets]
+        for segmentCount in (None, 1, 2, 3, 11):
+            profile = self.ALIGNER.queryProfile(query, segmentCount)
+            assert profile.alignMany(targets) == expected
+            assert profile.alignMany(targets, batchSize=2) == expected
+            assert profile.align(targets[0]) == expected[0]
+
+    def test_top_k(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xxabcdeyyabcdezzabcd'))
+        second = vocab.encodeSequence(Sequence('abcde'))
+        alignments = self.ALIGNER.topK(first, second, 5)
+        # The repeats are found once each instead of as overlapping
+        # variations of the best one.
+        assert [str(vocab.decodeSequence(a.first)) for a in
+                alignments[:3]] == ['a b c d e', 'a b c d e', 'a b c d']
+        scores = [a.score for a in alignments]
+        assert scores[0] == self.ALIGNER.align(first, second)
+        assert scores == sorted(scores, reverse=True)
+        assert len(self.ALIGNER.topK(first, second, 2)) == 2
+        assert len(self.ALIGNER.topK(first, second, 5, minScore=scores[1])) \
+            == 2
+
+    def test_forbid(self):
+        vocab = Vocabulary()
+        first = vocab.encodeSequence(Sequence('xxabcdeyyabcdezzabcd'))
+        second = vocab.encodeSequence(Sequence('abcdeabc'))
+        scores = numpy.asarray(DEFAULT_SCORING.scoreMatrix(first, second))
+        f = numpy.zeros((len(first) + 1, len(second) + 1), int)
+        pointers = numpy.zeros(f.shape, numpy.uint8)
+        self.ALIGNER.backend.fill(f, scores, DEFAULT_GAP_SCORE, local=True,
+                                  pointers=pointers)
+        # Only the cells the pairs change are filled again, which must give
+        # the same matrices as filling all of them.
+        self.ALIGNER.forbid(f, pointers, scores, [(2, 0), (3, 1), (12, 6)])
+        expected = numpy.zeros(f.shape, int)
+        expectedPointers = numpy.zeros(f.shape, numpy.uint8)
+        self.ALIGNER.backend.fill(expected, scores, DEFAULT_GAP_SCORE,
+                                  local=True, pointers=expectedPointers)
+        assert (f == expected).all()
+        assert (pointers == expectedPointers).all()
+
+
+class TestMatrixScoring(object):
+
+    def encode(self, *sequences):
+        vocab = Vocabulary()
+        encodeds = [vocab.encodeSequence(Sequence(s)) for s in sequences]
+        return vocab, encodeds
+
+    def test_from_simple_scoring(self):
+        vocab, (first, second) = self.encode('xabcaby', 'abcyab')
+        scoring = MatrixScoring.fromSimpleScoring(DEFAULT_SCORING, vocab)
+        for aligner in (GlobalSequenceAligner, StrictGlobalSequenceAligner,
+                        LocalSequenceAligner):
+            expected = aligner(DEFAULT_SCORING, DEFAULT_GAP_SCORE)
+            actual = aligner(scoring, DEFAULT_GAP_SCORE)
+            score, alignments = actual.align(first, second, backtrace=True)
+            expectedScore, expectedAlignments = expected.align(
+                first, second, backtrace=True)
+            assert score == expectedScore
+            assert [a.key() for a in alignments] == \
+                [a.key() for a in expectedAlignments]
+
+    def test_from_callable(self):
+        vocab, (first, second) = self.encode('abc', 'cab')
+        scoring = MatrixScoring.fromCallable(DEFAULT_SCORING, vocab)
+        expected = DEFAULT_SCORING.scoreMatrix(first, second)
+        assert (scoring.scoreMatrix(first, second) == expected).all()
+
+    def test_top_k_narrow_dtypes(self):
+        vocab, (first, second) = self.encode('xxabcdeyyabcdezzabcd', 'abcde')
+        for simple, dtype in ((SimpleScoring(3, -1), 'int8'),
+                              (SimpleScoring(3, -1), 'int16'),
+                              (SimpleScoring(3, 0), 'uint8'),
+                              (SimpleScoring(3, -1), 'float32')):
+            matrix = MatrixScoring.fromSimpleScoring(simple, vocab).matrix
+            expected = LocalSequenceAligner(MatrixScoring(matrix), -2).topK(
+                first, second, 4)
+            actual = LocalSequenceAligner(
+                MatrixScoring(matrix.astype(dtype)), -2).topK(first, second,
+                                                              4)
+            assert [(a.score, a.key()) for a in actual] == \
+                [(a.score, a.key()) for a in expected]
+
+    def test_from_dict(self):
+        vocab, (first, second) = self.encode('ab', 'ac')
+        scoring = MatrixScoring.fromDict(
+            {('a', 'a'): 3, ('b', 'c'): 1, ('b', 'z'): 5}, vocab, default=-1)
+        assert scoring(vocab.encode('a'), vocab.encode('a')) == 3
+        assert scoring(vocab.encode('c'), vocab.encode('b')) == 1
+        assert scoring(vocab.encode('a'), vocab.encode('b')) == -1
+        aligner = StrictGlobalSequenceAligner(scoring, DEFAULT_GAP_SCORE)
+        assert aligner.align(first, second) == 4
@@ -0,0 +1,147 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+
+# Initial vertical gap of the first lane. It never improves a cell.
+PADDING_SCORE = -(1 << 40)
+
+# Default number of targets aligned side by side.
+DEFAULT_BATCH_SIZE = 256
+
+
+# Query profile ---------------------------------------------------------------
+
+class QueryProfile(object):
+    # Farrar's striped Smith-Waterman. Query position i lives in segment
+    # i % segmentCount at lane i // segmentCount, so each segment is a
+    # vector with one element per lane and the recurrence runs over
+    # segments instead of query positions. Vertical gaps crossing lane
+    # boundaries are fixed up afterwards by the lazy-F loop, which usually
+    # stops after touching a few segments.
+    #
+    # The score vectors of the query against each code are computed once
+    # and reused for every target. Targets are aligned in batches, with the
+    # targets of a batch as one more vector dimension, so that the Python
+    # overhead of a column is shared by the whole batch.
+
+    def __init__(self, query, scoring, gapScore, segmentCount=None):
+        self.query = query.asArray()
+        self.scoring = scoring
+        self.gapScore = gapScore
+        m = len(self.query)
+        if segmentCount is None:
+            # Few segments mean few vector operations per target element,
+            # while the lazy-F loop needs more passes when lanes get long.
+            segmentCount = int(m ** 0.5) // 3 + 1
+        self.segmentCount = max(1, min(segmentCount, m))
+        self.laneCount = max(1, -(-m // self.segmentCount))
+        self.scores = dict()
+
+    def __len__(self):
+        return len(self.query)
+
+    def stripe(self, values):
+        # Lay out per-position values as a (segments x lanes) array. The
+        # padding at the end of the last lane never reaches a real cell.
+        size = self.segmentCount * self.laneCount
+        padded = numpy.full(size, PADDING_SCORE, values.dtype)
+        padded[:len(values)] = values
+        return padded.reshape(self.laneCount, self.segmentCount).T.copy()
+
+    def scoresFor(self, code):
+        scores = self.scores.get(code)
+        if scores is None:
+            codes = numpy.full(len(self.query), code)
+            scores = self.stripe(self.scoring.scorePairs(self.query, codes))
+            self.scores[code] = scores
+        return scores
+
+    def align(self, target):
+        return self.alignMany([target])[0]
+
+    def alignMany(self, targets, batchSize=DEFAULT_BATCH_SIZE):
+        # Best local alignment score of the query against each target, in
+        # the order of the targets. Targets of similar lengths are batched
+        # together.
+        elements = [target.asArray() for target in targets]
+        lengths = numpy.array([len(e) for e in elements], int)
+        order = numpy.argsort(-lengths, kind='mergesort')
+        results = [0] * len(elements)
+        for start in range(0, len(order), batchSize):
+            batch = order[start:start + batchSize]
+            scores = self.alignBatch([elements[k] for k in batch])
+            for k, score in zip(batch, scores):
+                results[k] = score
+        return results
+
+    def alignBatch(self, elements):
+        # `elements` are sorted by decreasing length, so the targets that
+        # still have columns left are always a prefix of the batch.
+        count = len(elements)
+        if count == 0 or len(self.query) == 0 or len(elements[0]) == 0:
+            return [0] * count
+        n = len(elements[0])
+        lengths = numpy.array([len(e) for e in elements], int)
+        alphabet = numpy.unique(numpy.concatenate(elements))
+        codes = numpy.zeros((count, n), alphabet.dtype)
+        for k, e in enumerate(elements):
+            codes[k, :len(e)] = e
+        activeCounts = (lengths[:, None] > numpy.arange(n)).sum(axis=0)
+
+        # Replace codes with rows of the stacked score vectors.
+        table = numpy.stack([self.scoresFor(c) for c in alphabet.tolist()])
+        rows = numpy.searchsorted(alphabet, codes)
+
+        gapScore = self.gapScore
+        segmentCount = self.segmentCount
+        shape = (count, segmentCount, self.laneCount)
+        previous = numpy.zeros(shape, int)
+        current = numpy.zeros(shape, int)
+        best = numpy.zeros(shape, int)
+        for j in range(n):
+            active = activeCounts[j]
+            scores = table[rows[:active, j]]
+            h = current[:active]
+            p = previous[:active]
+
+            # Diagonal predecessors of the first segment are the last
+            # segment of the previous column, shifted by one lane.
+            diagonal = _shift(p[:, -1], 0)
+            vF = numpy.full((active, self.laneCount), PADDING_SCORE, int)
+            for s in range(segmentCount):
+                vH = numpy.maximum(diagonal + scores[:, s],
+                                   p[:, s] + gapScore)
+                vH = numpy.maximum(vH, vF)
+                h[:, s] = numpy.maximum(vH, 0)
+                vF = h[:, s] + gapScore
+                diagonal = p[:, s]
+
+            # Lazy-F loop. Carry vertical gaps from the last segment of each
+            # lane into the next lane until they stop improving any cell.
+            # Carries are truncated like the cells they are stored in, or
+            # fractional gap scores would never stop improving a cell.
+            vF = _shift(vF, PADDING_SCORE).astype(int)
+            s = 0
+            while (vF > h[:, s]).any():
+                h[:, s] = numpy.maximum(h[:, s], vF)
+                vF = (h[:, s] + gapScore).astype(int)
+                s += 1
+                if s == segmentCount:
+                    vF = _shift(vF, PADDING_SCORE)
+                    s = 0
+
+            numpy.maximum(best[:active], h, out=best[:active])
+            previous, current = current, previous
+        return list(best.reshape(count, -1).max(axis=1))
+
+
+def _shift(vectors, value):
+    # Move every element one lane up, dropping the last one.
+    shifted = numpy.empty_like(vectors)
+    shifted[:, 0] = value
+    shifted[:, 1:] = vectors[:, :-1]
+    return shifted
@@ -0,0 +1,23 @@
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .sequencealigner import SimpleScoring
+from .sequencealigner import LocalSequenceAligner
+
+
+# Fixtures shared by the test modules.
+
+ALIGNER = LocalSequenceAligner(SimpleScoring(3, -1), -2)
+
+# Sentences with shared, reordered and missing words, and an empty one.
+CORPUS = ('a b c d', 'x a b y', '', 'a b c x d', 'x y z', 'c d a b c')
+
+
+def encode(*sentences):
+    # Encodes whitespace-separated sentences with one vocabulary. Every
+    # sequence has its position as id.
+    vocab = Vocabulary()
+    return [vocab.encodeSequence(Sequence(s.split(), id=k))
+            for k, s in enumerate(sentences)]
+
+
+SEQUENCES = encode(*CORPUS)
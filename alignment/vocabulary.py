@@ -1,3 +1,14 @@
+from six import iteritems
+
+import io
+import json
+from itertools import chain
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
 from .sequence import GAP_ELEMENT
 from .sequence import GAP_CODE
 from .sequence import Sequence
@@ -6,12 +17,55 @@ from .profile import SoftElement
 from .profile import Profile
 
 
+def elementFromJson(element):
+    # JSON has no tuples. Turn lists back into hashable elements.
+    if isinstance(element, list):
+        return tuple(element)
+    return element
+
+
 # Vocabulary ------------------------------------------------------------------
 
 class Vocabulary(object):
     def __init__(self):
         self.__elementToCode = {GAP_ELEMENT: GAP_CODE}
         self.__codeToElement = {GAP_CODE: GAP_ELEMENT}
+        self.__frozen = False
+        # Elements indexed by code, for decoding with numpy.take. Rebuilt
+        # when the vocabulary has grown.
+        self.__elementArray = None
+
+    @classmethod
+    def load(cls, path):
+        with io.open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        vocabulary = cls()
+        for element in data['elements'][1:]:
+            vocabulary.encode(elementFromJson(element))
+        if data.get('frozen'):
+            vocabulary.freeze()
+        return vocabulary
+
+    def save(self, path):
+        # Elements are stored in the order of their codes, so codes survive
+        # a round trip. Elements have to be JSON serializable.
+        data = {'elements': self.elements(), 'frozen': self.__frozen}
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False))
+
+    def freeze(self):
+        # A frozen vocabulary refuses to encode unknown elements.
+        self.__frozen = True
+
+    def isFrozen(self):
+        return self.__frozen
+
+    def dtype(self):
+        # The narrowest unsigned integer type that can hold every code.
+        for dtype in (numpy.uint8, numpy.uint16, numpy.uint32):
+            if len(self) - 1 <= numpy.iinfo(dtype).max:
+                return numpy.dtype(dtype)
+        return numpy.dtype(numpy.uint64)
 
     def has(self, element):
         return element in self.__elementToCode
@@ -22,6 +76,9 @@ class Vocabulary(object):
     def encode(self, element):
         code = self.__elementToCode.get(element)
         if code is None:
+            if self.__frozen:
+                raise KeyError('%r is not in the frozen vocabulary'
+                               % (element,))
             code = len(self.__elementToCode)
             self.__elementToCode[element] = code
             self.__codeToElement[code] = element
@@ -36,18 +93,76 @@ class Vocabulary(object):
                 % code)
 
     def encodeSequence(self, sequence):
-        encoded = EncodedSequence(len(sequence), id=sequence.id)
-        for element in sequence:
-            encoded.push(self.encode(element))
-        return encoded
+        return self.encodeMany([sequence])[0]
+
+    def encodeMany(self, sequences):
+        # Encode all sequences with a single pass over the dictionary. The
+        # encoded sequences are views of one code array, stored in the
+        # narrowest type that fits the vocabulary after encoding.
+        sequences = list(sequences)
+        elements = list(chain.from_iterable(sequences))
+        codes = list(map(self.__elementToCode.get, elements))
+        if None in codes:
+            # Add unknown elements in order of appearance, like encode().
+            for k, code in enumerate(codes):
+                if code is None:
+                    codes[k] = self.encode(elements[k])
+        codes = numpy.array(codes, self.dtype())
+        encodeds = list()
+        start = 0
+        for sequence in sequences:
+            stop = start + len(sequence)
+            encodeds.append(EncodedSequence.fromArray(codes[start:stop],
+                                                      id=sequence.id))
+            start = stop
+        return encodeds
 
     def decodeSequence(self, sequence):
-        decoded = Sequence(id=sequence.id)
-        for code in sequence:
-            decoded.push(self.decode(code))
-        return decoded
+        return self.decodeMany([sequence])[0]
+
+    def decodeMany(self, sequences):
+        # Decode all sequences with one numpy.take over their codes.
+        sequences = list(sequences)
+        arrays = [s.asArray() for s in sequences]
+        arrays = [a if a.dtype != object else a.astype(int) for a in arrays]
+        if arrays:
+            codes = numpy.concatenate(arrays)
+        else:
+            codes = numpy.zeros(0, int)
+        table = self.elementArray()
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(table)):
+            bad = codes[(codes < 0) | (codes >= len(table))][0]
+            raise KeyError(
+                'there is no elements in the vocabulary encoded as %r'
+                % int(bad))
+        elements = table.take(codes).tolist()
+        decodeds = list()
+        start = 0
+        for sequence, array in zip(sequences, arrays):
+            stop = start + len(array)
+            decodeds.append(Sequence(elements[start:stop], id=sequence.id))
+            start = stop
+        return decodeds
+
+    def elementArray(self):
+        # Object array with the element of code k at index k.
+        if self.__elementArray is None \
+                or len(self.__elementArray) != len(self):
+            array = numpy.empty(len(self), object)
+            for code, element in iteritems(self.__codeToElement):
+                array[code] = element
+            self.__elementArray = array
+        return self.__elementArray
 
     def decodeSequenceAlignment(self, alignment):
+        if isinstance(alignment, CompactSequenceAlignment):
+            return CompactSequenceAlignment(
+                alignment.ops,
+                self.decodeSequence(alignment.firstSequence),
+                self.decodeSequence(alignment.secondSequence),
+                alignment.firstStart, alignment.secondStart,
+                self.decode(alignment.gap), alignment.score,
+                alignment.similarCount)
         first = self.decodeSequence(alignment.first)
         second = self.decodeSequence(alignment.second)
         return SequenceAlignment(first, second, self.decode(alignment.gap),
@@ -86,5 +201,6 @@ class Vocabulary(object):
 
 
 # Cyclic imports.
+from .sequencealigner import CompactSequenceAlignment
 from .sequencealigner import SequenceAlignment
 from .profilealigner import ProfileAlignment
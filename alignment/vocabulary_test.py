@@ -0,0 +1,73 @@
+import numpy
+import pytest
+
+from .vocabulary import Vocabulary
+from .sequence import Sequence
+from .sequence import EncodedSequence
+
+
+def test_narrowest_dtype():
+    vocab = Vocabulary()
+    assert vocab.encodeSequence(Sequence('abc')).elements.dtype == \
+        numpy.uint8
+    vocab.encodeSequence(Sequence(range(253)))
+    assert len(vocab) == 257
+    encoded = vocab.encodeSequence(Sequence('abc'))
+    assert encoded.elements.dtype == numpy.uint16
+    assert encoded.key() == (1, 2, 3)
+    assert vocab.decodeSequence(encoded).elements == list('abc')
+
+
+def test_unsigned_codes_are_kept():
+    codes = numpy.array([1, 2, 3], numpy.uint8)
+    encoded = EncodedSequence(codes)
+    assert encoded.elements.dtype == numpy.uint8
+    assert encoded.reversed().elements.dtype == numpy.uint8
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'vocab.json')
+    vocab = Vocabulary()
+    encoded = vocab.encodeSequence(Sequence(['what', u'g\xfczel', 7,
+                                             ('a', 1)]))
+    vocab.save(path)
+    loaded = Vocabulary.load(path)
+    assert loaded.elements() == vocab.elements()
+    assert not loaded.isFrozen()
+    assert loaded.decodeSequence(encoded).elements == \
+        ['what', u'g\xfczel', 7, ('a', 1)]
+
+
+def test_freeze(tmp_path):
+    path = str(tmp_path / 'vocab.json')
+    vocab = Vocabulary()
+    vocab.encodeSequence(Sequence('ab'))
+    vocab.freeze()
+    assert vocab.encode('a') == 1
+    with pytest.raises(KeyError):
+        vocab.encodeSequence(Sequence('abc'))
+    assert len(vocab) == 3
+    vocab.save(path)
+    assert Vocabulary.load(path).isFrozen()
+
+
+def test_encode_many():
+    sequences = [Sequence('abca', id=1), Sequence(''), Sequence('dab', id=3)]
+    vocab = Vocabulary()
+    expected = [vocab.encodeSequence(s) for s in sequences]
+    bulk = Vocabulary()
+    encodeds = bulk.encodeMany(iter(sequences))
+    assert bulk.elements() == vocab.elements()
+    assert [(e.key(), e.id) for e in encodeds] == \
+        [(e.key(), e.id) for e in expected]
+
+
+def test_decode_many():
+    vocab = Vocabulary()
+    sequences = [Sequence('abca', id=1), Sequence(''), Sequence('dab', id=3)]
+    decodeds = vocab.decodeMany(vocab.encodeMany(sequences))
+    assert [(d.elements, d.id) for d in decodeds] == \
+        [(s.elements, s.id) for s in sequences]
+    assert vocab.decodeMany([]) == []
+    with pytest.raises(KeyError):
+        vocab.decodeSequence(EncodedSequence([1, 9]))
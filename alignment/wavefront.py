@@ -0,0 +1,175 @@
+from six.moves import range
+
+try:
+    import numpypy as numpy
+except ImportError:
+    import numpy
+
+
+# Bits of a backtrace pointer. A cell may have several optimal moves.
+DIAGONAL_MOVE = 1
+LEFT_MOVE = 2
+UP_MOVE = 4
+
+
+# Wavefront -------------------------------------------------------------------
+
+# The cells of an anti-diagonal (i + j == d) do not depend on each other, so
+# each diagonal is computed with a handful of vector operations. In a
+# row-major (m + 1) x (n + 1) matrix the cells of an anti-diagonal are n
+# elements apart, which lets us work on strided views of the flat matrix
+# instead of gathering and scattering with index arrays.
+
+def fill(f, scores, gapScore, freeEndGaps=False, local=False,
+         pointers=None):
+    m, n = scores.shape
+    if m == 0 or n == 0:
+        return f
+    if not f.flags.c_contiguous:
+        raise ValueError('alignment matrix must be C-contiguous')
+    width = n + 1
+    cells = f.reshape(-1)
+    if pointers is not None:
+        moves = pointers.reshape(-1)
+    substitutions = scores.reshape(-1)
+    # Consecutive cells on an anti-diagonal of the score matrix are n - 1
+    # elements apart. When n == 1 every diagonal has a single cell and the
+    # step does not matter.
+    scoreStep = max(n - 1, 1)
+    for d in range(2, m + n + 1):
+        lo = max(1, d - n)
+        hi = min(m, d - 1)
+        start = lo * width + d - lo
+        stop = hi * width + d - hi + 1
+        scoreStart = (lo - 1) * n + d - lo - 1
+        scoreStop = (hi - 1) * n + d - hi
+
+        diagonal = cells[start - width - 1:stop - width - 1:n]
+        left = cells[start - 1:stop - 1:n]
+        up = cells[start - width:stop - width:n]
+
+        # Match elements.
+        ab = diagonal + substitutions[scoreStart:scoreStop:scoreStep]
+
+        # Gap on first sequence.
+        ga = left + gapScore
+        if freeEndGaps and hi == m:
+            ga[-1] = left[-1]
+
+        # Gap on second sequence.
+        gb = up + gapScore
+        if freeEndGaps and d - lo == n:
+            gb[0] = up[0]
+
+        best = numpy.maximum(ab, numpy.maximum(ga, gb))
+        if local:
+            best = numpy.maximum(best, 0)
+        cells[start:stop:n] = best
+        if pointers is not None:
+            # Compare before the cells are truncated to integers so that
+            # fractional scores record the moves that were actually taken.
+            bits = numpy.where(ab == best, DIAGONAL_MOVE, 0)
+            bits |= numpy.where(ga == best, LEFT_MOVE, 0)
+            bits |= numpy.where(gb == best, UP_MOVE, 0)
+            moves[start:stop:n] = bits
+    return f
+
+
+# The score-only variants keep the last two anti-diagonals only, so memory
+# stays linear in the length of the shorter sequence. Diagonal d holds the
+# cells (i, d - i) for max(0, d - n) <= i <= min(m, d) and is indexed by
+# i - max(0, d - n). Boundary cells are part of the diagonals, which lets
+# the strict aligner accumulate its gap penalties along them.
+
+def sweep(a, b, scoring, gapScore, freeEndGaps=False, local=False,
+          boundaryGaps=False):
+    m = len(a)
+    n = len(b)
+    previous2 = None
+    previous = numpy.zeros(1, int)
+    yield 0, 0, previous
+    for d in range(1, m + n + 1):
+        lo = max(0, d - n)
+        hi = min(m, d)
+        current = numpy.empty(hi - lo + 1, int)
+
+        # Boundary cells.
+        previousLo = max(0, d - 1 - n)
+        if lo == 0:
+            if boundaryGaps:
+                current[0] = previous[0] + gapScore
+            else:
+                current[0] = 0
+        if hi == d:
+            if boundaryGaps:
+                current[-1] = previous[-1] + gapScore
+            else:
+                current[-1] = 0
+
+        # Interior cells.
+        ilo = max(1, d - n)
+        ihi = min(m, d - 1)
+        if ilo <= ihi:
+            previous2Lo = max(0, d - 2 - n)
+            diagonal = previous2[ilo - 1 - previous2Lo:ihi - previous2Lo]
+            left = previous[ilo - previousLo:ihi - previousLo + 1]
+            up = previous[ilo - 1 - previousLo:ihi - previousLo]
+
+            # Match elements.
+            ab = diagonal + scoring.scorePairs(a[ilo - 1:ihi],
+                                               b[d - ihi - 1:d - ilo][::-1])
+
+            # Gap on first sequence.
+            ga = left + gapScore
+            if freeEndGaps and ihi == m:
+                ga[-1] = left[-1]
+
+            # Gap on second sequence.
+            gb = up + gapScore
+            if freeEndGaps and d - ilo == n:
+                gb[0] = up[0]
+
+            cells = numpy.maximum(ab, numpy.maximum(ga, gb))
+            if local:
+                cells = numpy.maximum(cells, 0)
+            current[ilo - lo:ihi - lo + 1] = cells
+
+        yield d, lo, current
+        previous2, previous = previous, current
+
+
+def bestCell(a, b, scoring, gapScore, freeEndGaps=False, local=False,
+             boundaryGaps=False):
+    diagonals = sweep(a, b, scoring, gapScore, freeEndGaps, local,
+                      boundaryGaps)
+    if not local:
+        for _, _, current in diagonals:
+            pass
+        # noinspection PyUnboundLocalVariable
+        return current[-1], len(a), len(b)
+    best = 0
+    bestI = bestJ = 0
+    for d, lo, current in diagonals:
+        k = int(current.argmax())
+        if current[k] > best or (current[k] == best
+                                 and (lo + k, d - lo - k) < (bestI, bestJ)):
+            best = current[k]
+            bestI = lo + k
+            bestJ = d - lo - k
+    return best, bestI, bestJ
+
+
+def edges(a, b, scoring, gapScore, freeEndGaps=False, local=False,
+          boundaryGaps=False):
+    # Last row and last column of the alignment matrix.
+    m = len(a)
+    n = len(b)
+    lastRow = numpy.empty(n + 1, int)
+    lastColumn = numpy.empty(m + 1, int)
+    for d, lo, current in sweep(a, b, scoring, gapScore, freeEndGaps, local,
+                                boundaryGaps):
+        if d >= m:
+            lastRow[d - m] = current[m - lo]
+        if d >= n:
+            lastColumn[d - n] = current[d - n - lo]
+    return lastRow, lastColumn
@@ -0,0 +1,31 @@
+from __future__ import print_function
+
+from alignment.sequence import Sequence
+from alignment.vocabulary import Vocabulary
+from alignment.sequencealigner import SimpleScoring
+from alignment.msa import ProgressiveAligner
+
+
+# Create sequences to be aligned.
+sentences = [
+    'user root logged in from host',
+    'user admin logged in from host',
+    'user root logged out',
+    'session opened for user root',
+]
+sequences = [Sequence(s.split(), id=k) for k, s in enumerate(sentences)]
+
+# Create a vocabulary and encode the sequences.
+v = Vocabulary()
+encodeds = v.encodeMany(sequences)
+
+# Align all sequences progressively along a UPGMA guide tree.
+aligner = ProgressiveAligner(SimpleScoring(2, -1), -2, tree='upgma')
+alignment = aligner.align(encodeds)
+for row in v.decodeMany(alignment.rows()):
+    print(row)
+print('')
+
+# Print the time spent in each phase.
+for phase in ('distances', 'tree', 'merges'):
+    print('%s: %.3fs' % (phase, alignment.timings[phase]))
@@ -0,0 +1,36 @@
+from __future__ import print_function
+
+import io
+
+from alignment.sequence import Sequence
+from alignment.vocabulary import Vocabulary
+from alignment.sequencealigner import SimpleScoring, LocalSequenceAligner
+from alignment.pipeline import readTokens, alignStream, alignWindow
+
+
+# A corpus with one whitespace-tokenized sentence per line. Any open text
+# file or path works the same way; it is never read into memory at once.
+corpus = u'''user root logged in from host
+user admin logged in from host
+user root logged out
+session opened for user root
+'''
+
+# Sequences are encoded chunk by chunk with one shared vocabulary.
+v = Vocabulary()
+aligner = LocalSequenceAligner(SimpleScoring(2, -1), -2)
+
+# Align every sentence with a reference.
+reference = Sequence('user root logged in'.split())
+for sequence, (score, alignments) in alignStream(
+        aligner, v, reference, readTokens(io.StringIO(corpus)), chunkSize=2):
+    print('Sentence %s, score %d' % (sequence.id, score))
+    print(alignments[0])
+    print('')
+
+# Align every sentence with the one before it.
+for previous, sequence, (score, alignments) in alignWindow(
+        aligner, v, readTokens(io.StringIO(corpus)), window=1):
+    print('Sentences %s and %s, score %d' % (previous.id, sequence.id, score))
+    print(alignments[0])
+    print('')
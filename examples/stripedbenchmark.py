@@ -0,0 +1,34 @@
+from __future__ import print_function
+
+import random
+import time
+
+from alignment.sequence import Sequence
+from alignment.vocabulary import Vocabulary
+from alignment.sequencealigner import SimpleScoring, LocalSequenceAligner
+
+# Create a random query and many random targets over a small vocabulary.
+random.seed(0)
+words = 'the a of to and in is it that was for on with as'.split()
+v = Vocabulary()
+query = v.encodeSequence(Sequence(random.choice(words) for _ in range(50)))
+targets = [v.encodeSequence(Sequence(random.choice(words)
+                                     for _ in range(random.randint(100, 300))))
+           for _ in range(500)]
+aligner = LocalSequenceAligner(SimpleScoring(2, -1), -2)
+
+# Align the query against every target one by one.
+start = time.time()
+scores = [aligner.align(query, target) for target in targets]
+elapsed = time.time() - start
+print('One by one:    %.3f s' % elapsed)
+
+# Align the query against all targets with a reusable query profile.
+start = time.time()
+profile = aligner.queryProfile(query)
+stripedScores = profile.alignMany(targets)
+stripedElapsed = time.time() - start
+print('Query profile: %.3f s' % stripedElapsed)
+
+print('Speedup:       %.1fx' % (elapsed / stripedElapsed))
+print('Same scores:  ', scores == stripedScores)